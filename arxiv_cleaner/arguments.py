@@ -6,18 +6,128 @@ def parse_args():
     parser = argparse.ArgumentParser(
         description='Clean project for submitting on arXiv')
 
+    # Add the arguments of the cleaner
+    _add_clean_arguments(parser)
+
+    # Parse the arguments
+    args = parser.parse_args()
+
+    # Check the arguments of the cleaner
+    _check_clean_args(parser, args)
+
+    # Return the arguments
+    return args
+
+
+def parse_query_args():
+    # Create an argument parser
+    parser = argparse.ArgumentParser(
+        description='Query the dependency graph saved by the cleaner')
+
+    # Dependency graph
+    parser.add_argument('--graph', type=str, required=True,
+                        help='dependency graph file')
+    # Queries
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--needs', type=str,
+                       help=('list the files needed by the TEX files' +
+                             ' (Comma-separated paths)'))
+    group.add_argument('--users', type=str,
+                       help='list the TEX files which need the file')
+    group.add_argument('--without', type=str,
+                       help=('estimate the output without the TEX files' +
+                             ' (Comma-separated paths)'))
+
+    # Parse the arguments
+    args = parser.parse_args()
+
+    # Return the arguments
+    return args
+
+
+def parse_spool_args():
+    # Create an argument parser
+    parser = argparse.ArgumentParser(
+        description='Share batch cleaning through a spool directory')
+
+    # Create the subcommand parsers
+    subparsers = parser.add_subparsers(dest='command')
+
+    # Submit a job
+    submit_parser = subparsers.add_parser(
+        'submit', help='submit a cleaning job to the spool directory')
+    _add_spool_argument(submit_parser)
+    _add_clean_arguments(submit_parser)
+
+    # Run workers
+    worker_parser = subparsers.add_parser(
+        'worker', help='run workers cleaning the jobs in the spool directory')
+    _add_spool_argument(worker_parser)
+    worker_parser.add_argument('--processes', default=1, type=int,
+                               help='number of local worker processes')
+    worker_parser.add_argument('--poll_interval', default=2.0, type=float,
+                               help='seconds between checks for new jobs')
+    worker_parser.add_argument('--heartbeat_interval', default=30.0,
+                               type=float,
+                               help='seconds between lease renewals')
+    worker_parser.add_argument('--exit_when_empty', action='store_true',
+                               help='exit when there is no job left')
+
+    # Wait for the jobs
+    wait_parser = subparsers.add_parser(
+        'wait', help=('wait for all jobs and requeue the jobs of crashed' +
+                      ' workers'))
+    _add_spool_argument(wait_parser)
+    wait_parser.add_argument('--lease_timeout', default=300.0, type=float,
+                             help=('seconds without heartbeat before a job' +
+                                   ' is requeued'))
+    wait_parser.add_argument('--poll_interval', default=5.0, type=float,
+                             help='seconds between checks')
+
+    # Show the status
+    status_parser = subparsers.add_parser(
+        'status', help='show the number of jobs in each state')
+    _add_spool_argument(status_parser)
+
+    # Parse the arguments
+    args = parser.parse_args()
+
+    # Check whether the subcommand is given
+    if args.command is None:
+        parser.error('a subcommand is required')
+
+    # Check the arguments of the cleaner
+    if args.command == 'submit':
+        _check_clean_args(submit_parser, args)
+
+    # Return the arguments
+    return args
+
+
+def _add_spool_argument(parser):
+    # Spool directory
+    parser.add_argument('--spool', type=str, required=True,
+                        help='spool directory on shared storage')
+
+
+def _add_clean_arguments(parser):
     # Directories
     parser.add_argument('--input', type=str, required=True,
                         help='input directory')
-    parser.add_argument('--output', type=str, required=True,
+    parser.add_argument('--output', type=str,
                         help='output directory')
     # Targets
-    parser.add_argument('--tex', type=str, required=True,
+    parser.add_argument('--tex', type=str,
                         help=('TEX Files to keep (Comma-sepearted paths,' +
                               ' relative to input directory)'))
+    parser.add_argument('--targets', default='', type=str,
+                        help=('JSON file listing several output targets' +
+                              ' (replaces --output and --tex)'))
     # Commands customization
     parser.add_argument('--latex_compiler', default='pdflatex', type=str,
-                        help='LaTeX compiler (pdflatex, latex)')
+                        help=('LaTeX compiler (pdflatex, latex; several' +
+                              ' comma-separated compilers keep the files' +
+                              ' needed by any of them)'))
     parser.add_argument('--bib_compiler', default='bibtex', type=str,
                         help='Bibliography compiler (bibtex)')
     parser.add_argument('--latex_extra_args', default='', type=str,
@@ -26,12 +136,42 @@ def parse_args():
                         help='extra arguments passed to bibliography compiler')
     parser.add_argument('--latexpand_extra_args', default='', type=str,
                         help='extra arguments passed to latexpand')
+    # Performance
+    parser.add_argument('--jobs', default=None, type=int,
+                        help=('maximum number of parallel jobs (default:' +
+                              ' number of processors)'))
+    parser.add_argument('--sequential', action='store_true',
+                        help=('run the stages one by one in a fixed order' +
+                              ' (for debugging)'))
+    parser.add_argument('--cache_dir', default='', type=str,
+                        help=('directory of the persistent cache' +
+                              ' (disabled if empty)'))
+    parser.add_argument('--cache_max_size', default=1024, type=float,
+                        help='maximum size of the cache in megabytes')
+    parser.add_argument('--overlay', action='store_true',
+                        help=('compile without staging a temporary project' +
+                              ' by searching the expanded and input' +
+                              ' directories (TEXINPUTS)'))
+    # Dependency graph
+    parser.add_argument('--graph', default='', type=str,
+                        help=('path to save the dependency graph of the' +
+                              ' output files (see arxiv_cleaner.query)'))
     # Logging
     parser.add_argument('--verbose', action='store_true',
                         help='turns on verbose logging')
+    parser.add_argument('--log_json', action='store_true',
+                        help='print logs as JSON lines')
 
-    # Parse the arguments
-    args = parser.parse_args()
 
-    # Return the arguments
-    return args
+def _check_clean_args(parser, args):
+    # Check whether the output directory and TEX files are given
+    if not args.targets and not (args.output and args.tex):
+        parser.error('--output and --tex are required without --targets')
+
+    # Check whether the options of a single target are given with the targets
+    # (Each target sets them in the targets file)
+    if args.targets:
+        for name in ['output', 'tex', 'graph']:
+            if getattr(args, name):
+                parser.error(('--{} cannot be used with --targets (Set "{}"' +
+                              ' of each target instead)').format(name, name))
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import threading
+
+from arxiv_cleaner.file_utils import (
+    combine_paths, copy_file, does_file_exist, ensure_path_exist)
+
+
+class FileCache:
+    def __init__(self, cache_dir=None, name='cache', max_size=None):
+        # Save the arguments
+        self.cache_dir = cache_dir
+        self.name = name
+        self.max_size = max_size
+
+        # Initialize the counters and the lock guarding them
+        self.hits = 0
+        self.misses = 0
+        self.counter_lock = threading.Lock()
+
+    def is_enabled(self):
+        # The cache is disabled when no cache directory is given
+        return bool(self.cache_dir)
+
+    def build_key(self, parts):
+        # Serialize the key parts in a stable way
+        serialized = json.dumps(parts, sort_keys=True)
+
+        # Hash the serialized parts and return
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+    def get(self, key, dst_path):
+        # Check whether the cache is enabled
+        if not self.is_enabled():
+            return False
+
+        # Build the path to the cached file
+        cached_path = self._build_cached_path(key)
+
+        # Check whether the cached file exists
+        if not does_file_exist(cached_path):
+            # Count the cache miss
+            self._count(hit=False)
+
+            # Return the cache miss
+            return False
+
+        # Ensure the destination directory exists
+        ensure_path_exist(dst_path)
+
+        # Copy the cached file to the destination (The file may be evicted
+        # by another process at the same time)
+        try:
+            copy_file(cached_path, dst_path)
+        except FileNotFoundError:
+            # Count the cache miss
+            self._count(hit=False)
+
+            # Return the cache miss
+            return False
+
+        # Mark the cached file as recently used (Best effort since the file
+        # may be evicted after copying)
+        try:
+            os.utime(cached_path)
+        except FileNotFoundError:
+            pass
+
+        # Count the cache hit
+        self._count(hit=True)
+
+        # Return the cache hit
+        return True
+
+    def put(self, key, src_path):
+        # Check whether the cache is enabled
+        if not self.is_enabled():
+            return
+
+        # Build the path to the cached file
+        cached_path = self._build_cached_path(key)
+
+        # Ensure the cache directory exists
+        ensure_path_exist(cached_path)
+
+        # Build a temporary path next to the cached file
+        temp_path = '{}.{}.{}.tmp'.format(
+            cached_path, os.getpid(), threading.get_ident())
+
+        # Copy the file to the temporary path
+        copy_file(src_path, temp_path)
+
+        # Move the temporary file into place atomically
+        os.replace(temp_path, cached_path)
+
+    def trim(self):
+        # Check whether the cache is enabled and bounded
+        if not self.is_enabled() or self.max_size is None:
+            return
+
+        # Initialize the cached files
+        entries = []
+
+        # Find the cached files of this cache only (The cache directory may
+        # hold other caches and files of other programs)
+        for dir_path, _, file_names in os.walk(
+                combine_paths(self.cache_dir, self.name)):
+            for file_name in file_names:
+                # Skip the temporary files being written by other workers
+                if file_name.endswith('.tmp'):
+                    continue
+
+                # Build the path
+                path = combine_paths(dir_path, file_name)
+
+                # Read the size and last used time (The file may be removed
+                # by another process at the same time)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+                # Add the cached file
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        # Compute the total size
+        total_size = sum(size for _, size, _ in entries)
+
+        # Remove the least recently used files until the cache fits
+        for _, size, path in sorted(entries):
+            # Stop when the cache fits
+            if total_size <= self.max_size:
+                break
+
+            # Remove the file
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+            # Update the total size
+            total_size -= size
+
+    def _count(self, hit):
+        # Update the counters
+        with self.counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _build_cached_path(self, key):
+        # Build the path sharded by the key prefix and return
+        return combine_paths(self.cache_dir, self.name, key[:2], key)
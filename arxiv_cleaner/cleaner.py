@@ -1,18 +1,34 @@
+from functools import partial
+from pathlib import Path
+import threading
+
+from arxiv_cleaner.cache import FileCache
 from arxiv_cleaner.file_utils import (
-    build_relative_path, combine_paths, copy_files, create_temp_dir,
-    does_file_exist, find_files, remove_temp_dir,
-    remove_unnecessary_blank_lines)
+    build_relative_path, combine_paths, copy_file, copy_files,
+    create_temp_dir, does_file_exist, ensure_path_exist, find_files,
+    get_file_size, hash_file, remove_temp_dir, remove_unnecessary_blank_lines)
+from arxiv_cleaner.graph import DependencyGraph
 from arxiv_cleaner.latex import LatexRunner
 from arxiv_cleaner.logger import Logger
+from arxiv_cleaner.scheduler import Scheduler, Task
+from arxiv_cleaner.target import create_target
 
 
 class Cleaner:
     def __init__(self, input_dir=None, output_dir=None, tex=None,
-                 command_options=None, verbose=False):
+                 command_options=None, verbose=False, jobs=None,
+                 cache_dir=None, cache_max_size=None, graph_path=None,
+                 log_json=False, sequential=False, targets=None,
+                 overlay=False):
         # Save the arguments
         self.input_dir = input_dir
         self.output_dir = output_dir
         self.verbose = verbose
+        self.log_json = log_json
+        self.jobs = jobs
+        self.sequential = sequential
+        self.overlay = overlay
+        self.graph_path = graph_path
 
         # Initialize the logger
         self._init_logger()
@@ -20,60 +36,203 @@ class Cleaner:
         # Initialize input files
         self._init_input_files()
 
+        # Initialize the targets (A single target is built from the output
+        # directory and TEX files when no targets are given)
+        self._init_targets(targets, tex, command_options)
+
         # Initialize TEX files
-        self._init_tex_files(tex)
+        self._init_tex_files()
 
         # Initialize the latex runner
         self._init_latex_runner(command_options)
 
+        # Initialize the caches
+        self._init_caches(cache_dir, cache_max_size)
+
     ############################################################################
     # Cleaning Methods
     ############################################################################
 
     def clean(self):
         # Log the start
-        self.logger.info('Start cleaning')
+        self.logger.info('Start cleaning', stage='clean')
 
-        # Expand the files
-        expanded_dir_obj, expanded_dir = self.expand_files()
+        # Initialize the files copied to the output directory
+        self._init_copied_paths()
 
-        # Create a temporary project with expanded files
-        project_dir_obj, project_dir = self.create_temp_project()
+        # Build the tasks of the pipeline
+        tasks = self.build_tasks()
 
-        # Copy the input files to the temporary project directory
-        self.copy_input_files_to_project(project_dir)
+        # Create the scheduler
+        scheduler = Scheduler(jobs=self.jobs, sequential=self.sequential)
 
-        # Copy the expanded files to the temporary project directory
-        self.copy_expanded_files_to_project(expanded_dir, project_dir)
+        # Run the tasks
+        scheduler.run(tasks)
 
-        # Compile the TEX files with latex compiler to find the dependencies
-        project_deps = self.compile_tex_to_find_dependencies(project_dir)
+        # Log the finish
+        for target in self.targets:
+            self.logger.info(
+                'Check the cleaned project at "{}"'.format(target.output_dir),
+                stage='clean', target=target.name)
+
+    def build_tasks(self):
+        # Initialize the tasks with the staging tasks shared by all targets
+        # (The tasks are listed in the order of the sequential mode)
+        tasks = [
+            # Expand the files
+            Task('expand', self.expand_files,
+                 outputs=['expanded_dir_obj', 'expanded_dir']),
+            # Create a temporary project with expanded files (Only the build
+            # directories are created there in overlay mode)
+            Task('create_project', self.create_temp_project,
+                 outputs=['project_dir_obj', 'project_dir']),
+        ]
+
+        # Stage the files unless the compilers search the expanded and input
+        # directories directly
+        if self.overlay:
+            tasks.append(
+                # Mark the project as ready once the files are expanded
+                Task('stage_overlay', lambda: None, outputs=['staged_project'],
+                     after=['expanded_dir', 'project_dir']))
+        else:
+            tasks.extend([
+                # Copy the input files to the temporary project directory
+                Task('stage_input', self.copy_input_files_to_project,
+                     inputs=['project_dir'], outputs=['staged_input']),
+                # Copy the expanded files to the temporary project directory
+                Task('stage_expanded', self.copy_expanded_files_to_project,
+                     inputs=['expanded_dir', 'project_dir'],
+                     outputs=['staged_project'], after=['staged_input']),
+            ])
+
+        # Initialize the values to wait before removing temporary directories
+        finished_names = []
+
+        # Add the tasks of each target
+        for target in self.targets:
+            finished_names.extend(self._build_target_tasks(target, tasks))
+
+        # Report and trim the caches
+        tasks.append(Task(
+            'trim_caches', self.trim_caches, after=finished_names))
+
+        # Remove the temporary expanded and project directories
+        tasks.append(Task(
+            'remove_temp_dirs', self.remove_temp_dirs,
+            inputs=['expanded_dir_obj', 'project_dir_obj'],
+            after=finished_names))
+
+        # Return the tasks
+        return tasks
+
+    def _build_target_tasks(self, target, tasks):
+        # Build the names of the values produced for each TEX file
+        deps_names = self._build_value_names('deps', target)
+        compiler_deps_names = [
+            self._build_value_names('deps:{}'.format(i), target)
+            for i in range(len(target.latex_compilers))]
+        bbl_deps_names = self._build_value_names('bbl_deps', target)
+        copied_names = self._build_value_names('copied', target)
+        copied_bbl_names = self._build_value_names('copied_bbl', target)
+
+        # Build the name of the target
+        name = target.name
+
+        # Compile the TEX files with each latex compiler to find the
+        # dependencies (Each TEX file is compiled by each compiler in its own
+        # build directory, so all compiles of all targets can run
+        # concurrently. A TEX file therefore cannot read the AUX files of the
+        # other TEX files (e.g. with \zexternaldocument), which is intended:
+        # the cross-references are unresolved but the AUX files are not
+        # dependencies, so the dependencies found are the same)
+        for i, tex_file in enumerate(target.tex_files):
+            for j, compiler in enumerate(target.latex_compilers):
+                tasks.append(Task(
+                    'compile_tex:{}:{}:{}'.format(name, tex_file, compiler),
+                    partial(self.compile_tex_to_find_dependencies,
+                            target=target, tex_file=tex_file,
+                            compiler_index=j),
+                    inputs=['project_dir', 'expanded_dir'],
+                    outputs=[compiler_deps_names[j][i]],
+                    after=['staged_project']))
+
+        # Merge the dependencies found by all latex compilers
+        for i, tex_file in enumerate(target.tex_files):
+            tasks.append(Task(
+                'merge_deps:{}:{}'.format(name, tex_file),
+                self._merge_dependencies,
+                inputs=[names[i] for names in compiler_deps_names],
+                outputs=[deps_names[i]]))
 
         # Compile the TEX files with bibliography compiler to find the
-        # dependencies
-        bbl_deps = self.compile_bib_to_find_dependencies(project_dir)
+        # dependencies (The AUX file of the first latex compiler is used)
+        for i, tex_file in enumerate(target.tex_files):
+            tasks.append(Task(
+                'compile_bib:{}:{}'.format(name, tex_file),
+                partial(self.compile_bib_to_find_dependencies,
+                        target=target, tex_file=tex_file),
+                inputs=['project_dir', 'expanded_dir'],
+                outputs=[bbl_deps_names[i]],
+                after=[compiler_deps_names[0][i]]))
 
         # Copy the dependency files to the output directory
-        self.copy_dependencies_to_output(project_deps)
-
-        # Copy the expanded files to the output directory
-        self.copy_expanded_files_to_output(project_deps, expanded_dir)
-
-        # Copy the BBL dependencies to the output directory
-        self.copy_bbl_files_to_output(bbl_deps, project_dir)
-
-        # Remove unnecessary blank lines
-        self.remove_unnecessary_blank_lines()
-
-        # Remove the temporary expanded directory
-        remove_temp_dir(expanded_dir_obj)
-
-        # Remove the temporary project directory
-        remove_temp_dir(project_dir_obj)
-
-        # Log the finish
-        self.logger.info(
-            'Check the cleaned project at "{}"'.format(self.output_dir))
+        for i, tex_file in enumerate(target.tex_files):
+            tasks.append(Task(
+                'copy_deps:{}:{}'.format(name, tex_file),
+                partial(self.copy_dependencies_to_output,
+                        target=target, tex_file=tex_file),
+                inputs=[deps_names[i], 'expanded_dir'],
+                outputs=[copied_names[i]]))
+
+        # Copy the BBL dependencies to the output directory (After copying
+        # the other dependencies, which may include a stale BBL file shipped
+        # in the input directory, so the fresh BBL file overwrites it)
+        for i, tex_file in enumerate(target.tex_files):
+            tasks.append(Task(
+                'copy_bbl:{}:{}'.format(name, tex_file),
+                partial(self.copy_bbl_files_to_output,
+                        target=target, tex_file=tex_file),
+                inputs=[bbl_deps_names[i], 'project_dir'],
+                outputs=[copied_bbl_names[i]], after=copied_names))
+
+        # Remove unnecessary blank lines (BBL files are not affected)
+        tasks.append(Task(
+            'remove_blank_lines:{}'.format(name),
+            partial(self.remove_unnecessary_blank_lines, target=target),
+            outputs=['cleaned:{}'.format(name)], after=copied_names))
+
+        # Initialize the values to wait before removing temporary directories
+        finished_names = ['cleaned:{}'.format(name)] + copied_bbl_names
+
+        # Save the dependency graph of the output files
+        if target.graph_path:
+            tasks.extend([
+                # Collect the dependencies of all TEX files
+                Task('collect_deps:{}'.format(name),
+                     partial(self._build_root_values, target),
+                     inputs=deps_names,
+                     outputs=['root_deps:{}'.format(name)]),
+                # Collect the BBL dependencies of all TEX files
+                Task('collect_bbl_deps:{}'.format(name),
+                     partial(self._build_root_values, target),
+                     inputs=bbl_deps_names,
+                     outputs=['root_bbl_deps:{}'.format(name)]),
+                # Save the dependency graph
+                Task('save_graph:{}'.format(name),
+                     partial(self.save_dependency_graph, target=target),
+                     inputs=['root_deps:{}'.format(name),
+                             'root_bbl_deps:{}'.format(name),
+                             'expanded_dir'],
+                     outputs=['saved_graph:{}'.format(name)],
+                     after=finished_names),
+            ])
+
+            # Wait the dependency graph as well
+            finished_names = finished_names + ['saved_graph:{}'.format(name)]
+
+        # Return the values to wait
+        return finished_names
 
     ############################################################################
     # Steps
@@ -81,7 +240,9 @@ class Cleaner:
 
     def expand_files(self):
         # Log the start
-        self.logger.info('Start expanding files in input directory')
+        self.logger.info(
+            'Start expanding files in input directory',
+            stage='expand')
 
         # Initialize the extensions
         # Reference: https://tex.stackexchange.com/a/424669
@@ -92,14 +253,17 @@ class Cleaner:
 
         # Run latexpand and produce new files in the new temporary directory
         new_dir_obj, new_dir = self.latex_runner.run_latexpand(
-            self.input_dir, target_files)
+            self.input_dir, target_files,
+            expansion_cache=self.expansion_cache)
 
         # Return the final directory object and path
         return new_dir_obj, new_dir
 
     def create_temp_project(self):
         # Log the start
-        self.logger.info('Start creating temporary project')
+        self.logger.info(
+            'Start creating temporary project',
+            stage='create_project')
 
         # Create a temporary directory
         temp_dir_obj, temp_dir = create_temp_dir(name='temp_project')
@@ -110,110 +274,272 @@ class Cleaner:
     def copy_input_files_to_project(self, project_dir):
         # Log the start
         self.logger.info(
-            'Start copying files from input directory to temporary project')
+            'Start copying files from input directory to temporary project',
+            stage='stage_input')
 
         # Copy the files from the input directory to project directory
         copy_files(self.relative_input_paths, self.input_dir, project_dir)
 
     def copy_expanded_files_to_project(self, expanded_dir, project_dir):
         # Log the start
-        self.logger.info('Start copying files to temporary project')
+        self.logger.info(
+            'Start copying files to temporary project',
+            stage='stage_expanded')
 
         # Copy the files from the expanded directory to project directory
         copy_files(self.tex_files, expanded_dir, project_dir)
 
-    def compile_tex_to_find_dependencies(self, project_dir):
-        # Log the start
-        self.logger.info('Start compiling latex to find dependencies')
-
-        # Convert the relative input paths to set
-        relative_input_paths = set(self.relative_input_paths)
+    def compile_tex_to_find_dependencies(self, project_dir, expanded_dir,
+                                         target, tex_file, compiler_index=0):
+        # Get the latex compiler
+        compiler = target.latex_compilers[compiler_index]
 
-        # Initialize the project dependencies
-        project_deps = set()
-
-        # Find dependencies for each TEX file
-        for tex_file in self.tex_files:
-            # Build the full path
-            full_path = combine_paths(project_dir, tex_file)
+        # Log the start
+        self.logger.info(
+            'Start compiling "{}" with {} to find dependencies'.format(
+                tex_file, compiler), stage='compile_tex', target=target.name,
+            root=tex_file, compiler=compiler)
 
-            # Run the latex compiler to read the dependencies
-            fls_deps = self.latex_runner.run_latex_compiler(
-                project_dir, full_path)
+        # Build the full path and the search directories
+        full_path, search_dirs = self._build_compile_paths(
+            project_dir, expanded_dir, tex_file)
 
-            # Find the dependencies in the input directory
-            deps = fls_deps.intersection(relative_input_paths)
+        # Create the build directory
+        build_dir = self._create_build_dir(
+            project_dir, target, tex_file, compiler_index)
 
-            # Add the dependencies to the project dependencies
-            project_deps.update(deps)
+        # Run the latex compiler to read the dependencies
+        latex_runner = target.latex_runners[compiler_index]
+        fls_deps = latex_runner.run_latex_compiler(
+            project_dir, full_path, build_dir=build_dir,
+            search_dirs=search_dirs)
 
-        # Return the project dependencies
-        return project_deps
+        # Find the dependencies in the input directory and return
+        return fls_deps.intersection(self.relative_input_paths)
 
-    def compile_bib_to_find_dependencies(self, project_dir):
+    def compile_bib_to_find_dependencies(self, project_dir, expanded_dir,
+                                         target, tex_file):
         # Log the start
-        self.logger.info('Start compiling bibliography to find dependencies')
+        self.logger.info(
+            'Start compiling bibliography to find dependencies of "{}"'.format(
+                tex_file), stage='compile_bib', target=target.name,
+            root=tex_file)
 
-        # Initialize the BBL dependencies
-        bbl_deps = set()
+        # Build the full path and the search directories
+        full_path, search_dirs = self._build_compile_paths(
+            project_dir, expanded_dir, tex_file)
 
-        # Compile bibliography for each TEX file
-        for tex_file in self.tex_files:
-            # Build the full path
-            full_path = combine_paths(project_dir, tex_file)
+        # Build the path to the build directory
+        build_dir = self._build_build_dir(target, tex_file)
 
-            # Run the bibliography compiler to read the BBL dependencies
-            deps = self.latex_runner.run_bib_compiler(
-                project_dir, full_path)
+        # Run the bibliography compiler to read the BBL dependencies
+        deps = target.latex_runner.run_bib_compiler(
+            project_dir, full_path, bbl_cache=self.bbl_cache,
+            build_dir=build_dir, search_dirs=search_dirs)
 
-            # Add the dependencies to the project dependencies
-            bbl_deps.update(deps)
+        # Log the TEX file without bibliography
+        if len(deps) == 0:
+            self.logger.info(
+                'Skip bibliography of "{}" (no citations)'.format(tex_file),
+                stage='compile_bib', target=target.name, root=tex_file)
 
         # Return the BBL dependencies
-        return bbl_deps
+        return deps
 
-    def copy_dependencies_to_output(self, project_deps):
+    def copy_dependencies_to_output(self, deps, expanded_dir, target,
+                                    tex_file):
         # Log the start
-        self.logger.info('Start copying dependency files to output directory')
+        self.logger.info(
+            ('Start copying dependency files of "{}" to output' +
+             ' directory').format(tex_file), stage='copy_deps',
+            target=target.name, root=tex_file)
+
+        # Claim the files which haven't been copied for other TEX files
+        with self.copied_paths_lock:
+            copied_paths = self.copied_paths[target.name]
+            paths = (set(deps) | set([tex_file])) - copied_paths
+            copied_paths.update(paths)
+
+        # Split the files into expanded files and other input files
+        expanded_paths = [
+            path for path in paths
+            if does_file_exist(combine_paths(expanded_dir, path))]
+        input_paths = paths.difference(expanded_paths)
 
         # Copy the files from the input directory to output directory
-        copy_files(project_deps, self.input_dir, self.output_dir)
+        copy_files(input_paths, self.input_dir, target.output_dir)
 
-    def copy_expanded_files_to_output(self, project_deps, expanded_dir):
+        # Copy the files from the expanded directory to output directory
+        copy_files(expanded_paths, expanded_dir, target.output_dir)
+
+    def copy_bbl_files_to_output(self, bbl_deps, project_dir, target,
+                                 tex_file):
         # Log the start
-        self.logger.info('Start copying expanded files to output directory')
+        self.logger.info(
+            'Start copying BBL files of "{}" to output directory'.format(
+                tex_file), stage='copy_bbl', target=target.name,
+            root=tex_file)
 
-        # Copy the files from the expanded directory to output directory and
-        # skip any nonexistent dependency file
-        copy_files(project_deps, expanded_dir,
-                   self.output_dir, skip_nonexistent=True)
+        # Build the path to the build directory
+        build_dir = combine_paths(
+            project_dir, self._build_build_dir(target, tex_file))
 
-        # Copy the files from the expanded directory to output directory
-        copy_files(self.tex_files, expanded_dir, self.output_dir)
+        # Copy each BBL file from the build directory to output directory
+        for bbl_file in bbl_deps:
+            # Build the source path
+            src_path = combine_paths(build_dir, Path(bbl_file).name)
 
-    def copy_bbl_files_to_output(self, bbl_deps, project_dir):
-        # Log the start
-        self.logger.info('Start copying BBL files to output directory')
+            # Build the destination path
+            dst_path = combine_paths(target.output_dir, bbl_file)
 
-        # Copy the files from the project directory to output directory
-        copy_files(bbl_deps, project_dir, self.output_dir)
+            # Ensure the destination directory exists
+            ensure_path_exist(dst_path)
 
-    def remove_unnecessary_blank_lines(self):
+            # Copy the BBL file to the destination
+            copy_file(src_path, dst_path)
+
+    def remove_unnecessary_blank_lines(self, target):
         # Log the start
         self.logger.info(
-            'Start removing unnecessary blank lines in output directory')
+            'Start removing unnecessary blank lines in output directory',
+            stage='remove_blank_lines', target=target.name)
 
         # Initialize the extensions
         # Reference: https://tex.stackexchange.com/a/424669
         extensions = ['tex', 'cls', 'clo', 'sty', 'bst']
 
         # Find all target files in the input directory
-        target_files = find_files(self.output_dir, extensions=extensions)
+        target_files = find_files(target.output_dir, extensions=extensions)
 
         # Remove for each target file
         for target_file in target_files:
             remove_unnecessary_blank_lines(target_file)
 
+    def save_dependency_graph(self, root_deps, root_bbl_deps, expanded_dir,
+                              target):
+        # Log the start
+        self.logger.info(
+            'Start saving dependency graph to "{}"'.format(target.graph_path),
+            stage='save_graph', target=target.name)
+
+        # Create the dependency graph
+        graph = DependencyGraph()
+
+        # Add the output files needed by each TEX file
+        for tex_file in target.tex_files:
+            # Collect the TEX file itself, its dependencies and BBL files
+            paths = set([tex_file])
+            paths.update(root_deps[tex_file])
+            paths.update(root_bbl_deps[tex_file])
+
+            # Add the edges from the TEX file to the files
+            graph.add_root(tex_file, paths)
+
+            # Add the information of each file
+            for path in paths:
+                # Build the path to the output file
+                output_path = combine_paths(target.output_dir, path)
+
+                # Find the kind of the file
+                if path in root_bbl_deps[tex_file]:
+                    kind = 'bbl'
+                elif does_file_exist(combine_paths(expanded_dir, path)):
+                    kind = 'expanded'
+                else:
+                    kind = 'asset'
+
+                # Add the file with its size and hash
+                graph.add_file(path, kind, get_file_size(output_path),
+                               hash_file(output_path))
+
+        # Save the dependency graph
+        graph.save(target.graph_path)
+
+    def trim_caches(self):
+        # Report and trim each cache
+        for cache in [self.expansion_cache, self.bbl_cache]:
+            # Skip the disabled cache
+            if not cache.is_enabled():
+                continue
+
+            # Log the counters
+            self.logger.info(
+                'Cache "{}": {} hits, {} misses'.format(
+                    cache.name, cache.hits, cache.misses),
+                stage='trim_caches')
+
+            # Remove the least recently used files
+            cache.trim()
+
+    def remove_temp_dirs(self, *dir_objs):
+        # Log the start
+        self.logger.info(
+            'Start removing temporary directories',
+            stage='remove_temp_dirs')
+
+        # Remove each temporary directory
+        for dir_obj in dir_objs:
+            remove_temp_dir(dir_obj)
+
+    ############################################################################
+    # Helpers
+    ############################################################################
+
+    def _build_value_names(self, prefix, target):
+        # Build the name of the value for each TEX file and return
+        return ['{}:{}:{}'.format(prefix, target.name, tex_file)
+                for tex_file in target.tex_files]
+
+    def _build_root_values(self, target, *values):
+        # Map each TEX file to its value and return
+        return dict(zip(target.tex_files, values))
+
+    def _merge_dependencies(self, *all_deps):
+        # Initialize the merged dependencies
+        merged_deps = set()
+
+        # Merge the dependencies
+        for deps in all_deps:
+            merged_deps.update(deps)
+
+        # Return the merged dependencies
+        return merged_deps
+
+    def _build_compile_paths(self, project_dir, expanded_dir, tex_file):
+        # Compile the staged TEX file in the project directory
+        if not self.overlay:
+            return combine_paths(project_dir, tex_file), None
+
+        # Search the expanded directory first and then the input directory
+        search_dirs = [expanded_dir, self.input_dir]
+
+        # Compile the expanded TEX file and return
+        return combine_paths(expanded_dir, tex_file), search_dirs
+
+    def _build_build_dir(self, target, tex_file, compiler_index=0):
+        # Find the indices of the target and TEX file
+        target_index = self.targets.index(target)
+        tex_index = target.tex_files.index(tex_file)
+
+        # Build the path relative to the project directory and return (The
+        # name avoids a leading dot since TeX may refuse to write there)
+        return combine_paths('_arxiv_cleaner_build', str(target_index),
+                             str(tex_index), str(compiler_index))
+
+    def _create_build_dir(self, project_dir, target, tex_file,
+                          compiler_index=0):
+        # Build the path to the build directory
+        build_dir = self._build_build_dir(target, tex_file, compiler_index)
+
+        # Create the build directory and its subdirectories mirroring the
+        # input directory (LaTeX writes the AUX files of included files there)
+        for sub_dir in ['.'] + self.input_sub_dirs:
+            Path(project_dir, build_dir, sub_dir).mkdir(
+                parents=True, exist_ok=True)
+
+        # Return the path to the build directory
+        return build_dir
+
     ############################################################################
     # Initialization
     ############################################################################
@@ -222,8 +548,15 @@ class Cleaner:
         # Set the logging level
         level = 'INFO' if self.verbose else 'WARNING'
 
-        # Create a logger
-        self.logger = Logger('cleaner', level=level)
+        # Create a logger carrying the project in each record
+        self.logger = Logger('cleaner', level=level, json_lines=self.log_json,
+                             fields={'project': self.input_dir})
+
+    def _init_copied_paths(self):
+        # Initialize the files copied to the output directory of each target
+        # and the lock guarding them
+        self.copied_paths = {target.name: set() for target in self.targets}
+        self.copied_paths_lock = threading.Lock()
 
     def _init_input_files(self):
         # Find all files in the input directory and save
@@ -233,9 +566,46 @@ class Cleaner:
         self.relative_input_paths = [build_relative_path(
             f, self.input_dir) for f in self.input_files]
 
-    def _init_tex_files(self, tex):
-        # Parse the TEX files and save
-        self.tex_files = tex.split(',')
+        # Find the subdirectories of the input directory and save
+        self.input_sub_dirs = sorted(set(
+            Path(path).parent.as_posix() for path in self.relative_input_paths
+            if Path(path).parent.as_posix() != '.'))
+
+    def _init_targets(self, targets, tex, command_options):
+        # Check whether the options of a single target are given with the
+        # targets (They would be ignored)
+        if targets is not None and (self.output_dir or tex or
+                                    self.graph_path):
+            raise ValueError('Output directory, TEX files and graph path' +
+                             ' must be given by each target')
+
+        # Build the single target when no targets are given
+        if targets is None:
+            targets = [{
+                'name': 'default',
+                'output': self.output_dir,
+                'tex': tex,
+                'graph': self.graph_path,
+            }]
+
+        # Create the targets and save
+        self.targets = [create_target(spec, command_options)
+                        for spec in targets]
+
+        # Check whether the names and output directories are unique
+        for key in ['name', 'output_dir']:
+            values = [getattr(target, key) for target in self.targets]
+            if len(set(values)) != len(values):
+                raise ValueError(
+                    'Targets must have unique {} values'.format(key))
+
+    def _init_tex_files(self):
+        # Collect the TEX files of all targets in order and save
+        self.tex_files = []
+        for target in self.targets:
+            for tex_file in target.tex_files:
+                if tex_file not in self.tex_files:
+                    self.tex_files.append(tex_file)
 
         # Check whether the TEX files exist
         self._check_tex_files()
@@ -244,6 +614,20 @@ class Cleaner:
         # Create a latex runner and save
         self.latex_runner = LatexRunner(command_options)
 
+    def _init_caches(self, cache_dir, cache_max_size):
+        # Split the size bound between the caches (Each cache trims its own
+        # subdirectory)
+        if cache_max_size is not None:
+            cache_max_size = cache_max_size // 2
+
+        # Create the expansion cache and save
+        self.expansion_cache = FileCache(
+            cache_dir=cache_dir, name='latexpand', max_size=cache_max_size)
+
+        # Create the BBL cache and save
+        self.bbl_cache = FileCache(
+            cache_dir=cache_dir, name='bbl', max_size=cache_max_size)
+
     def _check_tex_files(self):
         # Check each TEX file
         for tex_file in self.tex_files:
@@ -2,24 +2,22 @@ import shlex
 import subprocess
 
 
-def run_command(command, stdout=None, stderr=None, cwd=None):
+def run_command(command, stdout=None, stderr=None, cwd=None, env=None):
     # Split the command into a sequence of arguments
     args = shlex.split(command)
 
     try:
         # Run the command
         p_obj = subprocess.Popen(
-            args, stdout=stdout, stderr=stderr, cwd=cwd)
+            args, stdout=stdout, stderr=stderr, cwd=cwd, env=env)
 
-        # Wait the process to finish
-        p_obj.wait()
+        # Wait the process to finish and read stdout and stderr (Reading
+        # while waiting avoids deadlocks when the pipes are full)
+        stdout_result, stderr_result = p_obj.communicate()
 
         # Read return code
         return_code = p_obj.returncode
 
-        # Read stdout and stderr
-        stdout_result, stderr_result = p_obj.communicate()
-
         # Decode the stdout or set the result to none
         if stdout == subprocess.PIPE:
             stdout_result = decode_output(stdout_result)
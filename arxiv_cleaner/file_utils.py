@@ -1,3 +1,4 @@
+import hashlib
 from pathlib import Path
 import re
 import shutil
@@ -155,6 +156,27 @@ def find_files(path, extensions=[None], recursive=True):
     return all_found_files
 
 
+def get_file_size(path):
+    # Build the path object
+    path_obj = Path(path)
+
+    # Return the size of the file in bytes
+    return path_obj.stat().st_size
+
+
+def hash_file(path):
+    # Create the hash object
+    hash_obj = hashlib.sha256()
+
+    # Read the file chunk by chunk and update the hash
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(65536), b''):
+            hash_obj.update(chunk)
+
+    # Return the hexadecimal digest
+    return hash_obj.hexdigest()
+
+
 def remove_temp_dir(dir_obj):
     dir_obj.cleanup()
 
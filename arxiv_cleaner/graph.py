@@ -0,0 +1,108 @@
+import json
+
+from arxiv_cleaner.file_utils import ensure_path_exist
+
+
+class DependencyGraph:
+    def __init__(self, roots=None, files=None):
+        # Save the edges from each root to the files it needs
+        self.roots = roots or {}
+
+        # Save the information (kind, size and hash) of each file
+        self.files = files or {}
+
+    ############################################################################
+    # Building
+    ############################################################################
+
+    def add_root(self, root, paths):
+        # Add the edges from the root to the files
+        self.roots.setdefault(root, set()).update(paths)
+
+    def add_file(self, path, kind, size, sha256):
+        # Add the information of the file
+        self.files[path] = {
+            'kind': kind,
+            'size': size,
+            'sha256': sha256,
+        }
+
+    ############################################################################
+    # Queries
+    ############################################################################
+
+    def find_files(self, roots):
+        # Check whether the roots exist
+        self._check_roots(roots)
+
+        # Initialize the files
+        files = set()
+
+        # Collect the files needed by each root
+        for root in roots:
+            files.update(self.roots[root])
+
+        # Return the sorted files
+        return sorted(files)
+
+    def find_roots(self, path):
+        # Find the roots which need the file and return
+        return sorted(root for root, paths in self.roots.items()
+                      if path in paths)
+
+    def find_roots_except(self, excluded_roots):
+        # Check whether the roots exist
+        self._check_roots(excluded_roots)
+
+        # Find the remaining roots and return
+        return sorted(root for root in self.roots
+                      if root not in excluded_roots)
+
+    def compute_size(self, paths):
+        # Sum the sizes of the files and return
+        return sum(self.files[path]['size'] for path in paths
+                   if path in self.files)
+
+    ############################################################################
+    # Persistence
+    ############################################################################
+
+    def save(self, path):
+        # Build the serializable data
+        data = {
+            'version': 1,
+            'roots': {root: sorted(paths)
+                      for root, paths in self.roots.items()},
+            'files': self.files,
+        }
+
+        # Ensure the directory exists
+        ensure_path_exist(path)
+
+        # Write the data in compact JSON
+        with open(path, 'w', encoding='utf-8') as fp:
+            json.dump(data, fp, sort_keys=True, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path):
+        # Read the data
+        with open(path, 'r', encoding='utf-8') as fp:
+            data = json.load(fp)
+
+        # Check the version
+        if data.get('version') != 1:
+            raise ValueError(
+                'Unknown dependency graph version in "{}"'.format(path))
+
+        # Build the graph and return
+        return cls(roots={root: set(paths)
+                          for root, paths in data['roots'].items()},
+                   files=data['files'])
+
+    def _check_roots(self, roots):
+        # Check each root
+        for root in roots:
+            if root not in self.roots:
+                raise ValueError(
+                    'Root "{}" does not exist in the dependency graph'.format(
+                        root))
@@ -1,10 +1,12 @@
+import os
+from pathlib import Path
 import re
 import subprocess
 
 from arxiv_cleaner.cli import run_command, check_command_results
 from arxiv_cleaner.file_utils import (
     build_relative_path, change_extension, combine_paths, create_temp_dir,
-    ensure_path_exist)
+    does_file_exist, ensure_path_exist, hash_file)
 
 
 class LatexRunner:
@@ -12,10 +14,18 @@ class LatexRunner:
         # Save the arguments
         self.command_options = command_options
 
-    def run_latexpand(self, root_dir, tex_files):
+        # Initialize the latexpand version (Read only when needed)
+        self.latexpand_version = None
+
+    def run_latexpand(self, root_dir, tex_files, expansion_cache=None):
         # Create a temporary directory
         temp_dir_obj, temp_dir = create_temp_dir(name='latexpand_output')
 
+        # Initialize the hashes and included files of each file (Shared by all
+        # TEX files since they often include the same files)
+        file_hashes = {}
+        file_includes = {}
+
         # Process each TEX file
         for tex_file in tex_files:
             # Build the relative path
@@ -27,6 +37,16 @@ class LatexRunner:
             # Ensure the output directory exists
             ensure_path_exist(output_path)
 
+            # Build the cache key from the file and all files it includes
+            cache_key = self._build_latexpand_cache_key(
+                root_dir, relative_path, file_hashes, file_includes,
+                expansion_cache)
+
+            # Reuse the cached output if there is one
+            if expansion_cache is not None and \
+                    expansion_cache.get(cache_key, output_path):
+                continue
+
             # Build the command to run latexpand
             command = self._build_latexpand_command(output_path, relative_path)
 
@@ -36,28 +56,81 @@ class LatexRunner:
             # Check return code and STDERR
             check_command_results(command, return_code, stdout, stderr)
 
+            # Save the output to the cache
+            if expansion_cache is not None:
+                expansion_cache.put(cache_key, output_path)
+
         # Return the temporary directory object and path
         return temp_dir_obj, temp_dir
 
-    def run_latex_compiler(self, root_dir, tex_file):
+    def run_latex_compiler(self, root_dir, tex_file, build_dir=None,
+                           search_dirs=None):
         # Build the command to run the compiler
-        command = self._build_latex_compiler_command(tex_file)
+        command = self._build_latex_compiler_command(tex_file, build_dir)
 
         # Run the command
-        return_code, stdout, stderr = run_command(command, cwd=root_dir)
+        return_code, stdout, stderr = run_command(
+            command, cwd=root_dir, env=self._build_search_env(search_dirs))
 
         # Check return code and STDERR
         check_command_results(command, return_code, stdout, stderr)
 
         # Build the path to FLS file
-        fls_path = change_extension(tex_file, '.fls')
+        fls_path = self._build_output_path(
+            root_dir, tex_file, build_dir, '.fls')
 
         # Read the FLS file to get all dependencies and return
-        return self._read_fls_dependencies(fls_path)
+        return self._read_fls_dependencies(fls_path, root_dir, search_dirs)
+
+    def run_bib_compiler(self, root_dir, tex_file, bbl_cache=None,
+                         build_dir=None, search_dirs=None):
+        # Build the path to AUX file
+        aux_file = self._build_output_path(
+            root_dir, tex_file, build_dir, '.aux')
+
+        # Build the directory of the included AUX files
+        aux_dir = combine_paths(root_dir, build_dir or '')
+
+        # Search the build directory first for the bibliography databases
+        # and styles (LaTeX writes generated files there, e.g. the databases
+        # of filecontents or biblatex)
+        bib_search_dirs = [aux_dir] + (search_dirs or [root_dir])
+
+        # Read the citations, databases and style from the AUX file
+        citations, bib_names, bst_name = self._read_aux_bibliography(
+            aux_file, aux_dir)
 
-    def run_bib_compiler(self, root_dir, tex_file):
-        # Build the relative path
-        relative_path = build_relative_path(tex_file, root_dir)
+        # Check whether biblatex wrote the AUX file (biber reads the citations
+        # and databases from the BCF file, so the AUX file tells nothing)
+        uses_biblatex = self._is_biblatex_aux(aux_file)
+
+        # Skip the compiler when there is no bibliography to produce (Only
+        # known from the AUX file of BibTeX)
+        if not uses_biblatex and (len(citations) == 0 or len(bib_names) == 0):
+            return set()
+
+        # Use no cache for biblatex since the key is built from the AUX file
+        if uses_biblatex:
+            bbl_cache = None
+
+        # Build the path to BBL file
+        bbl_file = self._build_output_path(
+            root_dir, tex_file, build_dir, '.bbl')
+
+        # Build the relative path to BBL file next to the TEX file
+        relative_bbl_file = self._map_to_relative_path(
+            change_extension(tex_file, '.bbl'), root_dir, search_dirs)
+
+        # Build the cache key from everything the BBL file depends on
+        cache_key = self._build_bbl_cache_key(
+            bib_search_dirs, citations, bib_names, bst_name, bbl_cache)
+
+        # Reuse the cached BBL file if there is one
+        if bbl_cache is not None and bbl_cache.get(cache_key, bbl_file):
+            return set([relative_bbl_file])
+
+        # Build the relative path to BBL file
+        relative_path = build_relative_path(bbl_file, root_dir)
 
         # Remove the file extension
         relative_path = change_extension(relative_path, '')
@@ -66,26 +139,189 @@ class LatexRunner:
         command = self._build_bib_compiler_command(relative_path)
 
         # Run the command
-        return_code, _, _ = run_command(command, cwd=root_dir)
-
-        # Check whether the result is successful
-        if return_code == 0:
-            # Build the path to BBL file
-            bbl_file = change_extension(tex_file, '.bbl')
-
-            # Build the relative path
-            bbl_file = build_relative_path(bbl_file, root_dir)
+        return_code, stdout, stderr = run_command(
+            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            cwd=root_dir, env=self._build_search_env(bib_search_dirs))
+
+        # Check whether the compiler failed (BibTeX returns 1 on warnings)
+        if return_code > 1 or not does_file_exist(bbl_file):
+            raise ValueError(('Failed to compile the bibliography with the' +
+                              ' command "{}"\n' +
+                              'Return code: {}\n' +
+                              'STDOUT->\n{}\n' +
+                              'STDERR->\n{}').format(
+                command, return_code, stdout, stderr))
+
+        # Save the BBL file to the cache
+        if bbl_cache is not None:
+            bbl_cache.put(cache_key, bbl_file)
+
+        # Return the BBL dependencies
+        return set([relative_bbl_file])
+
+    def _is_biblatex_aux(self, aux_file):
+        # Check whether biblatex wrote its control file next to the AUX file
+        if does_file_exist(change_extension(aux_file, '.bcf')):
+            return True
+
+        # Return false when the AUX file doesn't exist
+        if not does_file_exist(aux_file):
+            return False
+
+        # Check whether the AUX file contains the commands of biblatex
+        with open(aux_file, encoding='utf-8', errors='replace') as fp:
+            return any(line.startswith('\\abx@aux') for line in fp)
+
+    def _read_aux_bibliography(self, aux_file, aux_dir):
+        # Initialize the citations, bibliography databases and style
+        citations = []
+        bib_names = []
+        bst_name = None
+
+        # Return nothing when the AUX file doesn't exist
+        if not does_file_exist(aux_file):
+            return citations, bib_names, bst_name
+
+        # Read all lines in the AUX file
+        with open(aux_file, encoding='utf-8', errors='replace') as fp:
+            lines = fp.readlines()
 
-            # Set the BBL dependencies by adding the BBL file
-            deps = set([bbl_file])
-        else:
-            # Set the empty BBL dependencies
-            deps = set()
+        # Initialize the pattern
+        pattern = re.compile(
+            r'\\(?P<command>citation|bibdata|bibstyle|@input)' +
+            r'\{(?P<value>.*)\}\s*')
 
-        # Return the dependencies
-        return deps
+        # Check the commands in each line
+        for line in lines:
+            # Find the full match
+            match = pattern.fullmatch(line)
 
-    def _read_fls_dependencies(self, fls_path):
+            # Skip the line if there is no match
+            if not match:
+                continue
+
+            # Get the command and its value
+            command = match.group('command')
+            value = match.group('value')
+
+            if command == 'citation':
+                # Add the new citation keys in citation order
+                for key in value.split(','):
+                    if key not in citations:
+                        citations.append(key)
+            elif command == 'bibdata':
+                # Add the bibliography databases
+                bib_names.extend(value.split(','))
+            elif command == 'bibstyle':
+                # Set the bibliography style
+                bst_name = value
+            else:
+                # Read the included AUX file (e.g., produced by \include)
+                sub_aux_file = combine_paths(aux_dir, value)
+                sub_citations, sub_bib_names, sub_bst_name = \
+                    self._read_aux_bibliography(sub_aux_file, aux_dir)
+
+                # Merge the results of the included AUX file
+                for key in sub_citations:
+                    if key not in citations:
+                        citations.append(key)
+                bib_names.extend(sub_bib_names)
+                bst_name = sub_bst_name or bst_name
+
+        # Return the citations, bibliography databases and style
+        return citations, bib_names, bst_name
+
+    def _build_bbl_cache_key(self, search_dirs, citations, bib_names,
+                             bst_name, bbl_cache):
+        # Skip building the key when there is no cache
+        if bbl_cache is None or not bbl_cache.is_enabled():
+            return None
+
+        # Hash the bibliography databases
+        bib_hashes = [self._hash_local_file(search_dirs, name, '.bib')
+                      for name in bib_names]
+
+        # Hash the bibliography style
+        bst_hash = self._hash_local_file(search_dirs, bst_name, '.bst')
+
+        # Build the key and return (Keep the citation order since unsorted
+        # styles number the entries by the order of citations)
+        return bbl_cache.build_key({
+            'citations': citations,
+            'bib': bib_hashes,
+            'bst': bst_hash,
+            'compiler': self.command_options['bib']['compiler'],
+            'extra_args': self.command_options['bib']['extra_args'],
+        })
+
+    def _hash_local_file(self, search_dirs, name, ext):
+        # Skip the unknown file
+        if name is None:
+            return None
+
+        # Find the local file in the search directories
+        for search_dir in search_dirs:
+            # Build the path to the local file
+            path = combine_paths(search_dir, name)
+
+            # Append the extension if the name doesn't have one
+            if not path.endswith(ext):
+                path = path + ext
+
+            # Hash the first local file found
+            if does_file_exist(path):
+                return [name, hash_file(path)]
+
+        # Identify the file from the TeX distribution by its name
+        return [name, None]
+
+    def _build_search_env(self, search_dirs):
+        # Use the current environment without search directories
+        if not search_dirs:
+            return None
+
+        # Copy the current environment
+        env = dict(os.environ)
+
+        # Search the directories before the original (or default) paths of
+        # TeX files, bibliography databases and styles (The trailing empty
+        # path means the default paths)
+        for name in ['TEXINPUTS', 'BIBINPUTS', 'BSTINPUTS']:
+            env[name] = os.pathsep.join(
+                [os.path.abspath(path) for path in search_dirs] +
+                [os.environ.get(name, '')])
+
+        # Return the environment
+        return env
+
+    def _map_to_relative_path(self, path, root_dir, search_dirs):
+        # Resolve the path relative to the working directory
+        full_path = os.path.abspath(os.path.join(root_dir, path))
+
+        # Find the first search directory containing the path
+        for search_dir in search_dirs or [root_dir]:
+            # Resolve the search directory
+            full_search_dir = os.path.abspath(search_dir)
+
+            # Build the relative path if the search directory contains it
+            if full_path.startswith(full_search_dir + os.sep):
+                return build_relative_path(full_path, full_search_dir)
+
+        # Return the normalized path outside all search directories
+        return Path(full_path).as_posix()
+
+    def _build_output_path(self, root_dir, tex_file, build_dir, ext):
+        # Build the path next to the TEX file without a build directory
+        if not build_dir:
+            return change_extension(tex_file, ext)
+
+        # Build the file name from the job name (the TEX file name)
+        file_name = change_extension(Path(tex_file).name, ext)
+
+        # Build the path in the build directory and return
+        return combine_paths(root_dir, build_dir, file_name)
+
+    def _read_fls_dependencies(self, fls_path, root_dir, search_dirs=None):
         # Read all lines in the FLS file
         with open(fls_path) as fp:
             lines = fp.readlines()
@@ -103,8 +339,10 @@ class LatexRunner:
 
             # Check if there is a match
             if match:
-                # Get the input path
-                input_path = match.group('path')
+                # Get the input path relative to the search directory where
+                # it was found
+                input_path = self._map_to_relative_path(
+                    match.group('path'), root_dir, search_dirs)
 
                 # Add the input path to the set
                 deps.add(input_path)
@@ -112,6 +350,108 @@ class LatexRunner:
         # Return the dependencies
         return deps
 
+    def _build_latexpand_cache_key(self, root_dir, relative_path, file_hashes,
+                                   file_includes, expansion_cache):
+        # Skip building the key when there is no cache
+        if expansion_cache is None or not expansion_cache.is_enabled():
+            return None
+
+        # Initialize the files to visit and the visited files
+        pending_paths = [relative_path]
+        visited_paths = set()
+
+        # Visit the file and all files it includes transitively
+        while len(pending_paths) > 0:
+            # Get the next file
+            path = pending_paths.pop()
+
+            # Skip the visited file
+            if path in visited_paths:
+                continue
+
+            # Mark the file as visited
+            visited_paths.add(path)
+
+            # Build the full path
+            full_path = combine_paths(root_dir, path)
+
+            # Skip the missing file (Its name is still part of the key)
+            if not does_file_exist(full_path):
+                continue
+
+            # Hash the file once
+            if path not in file_hashes:
+                file_hashes[path] = hash_file(full_path)
+
+            # Find the included files once
+            if path not in file_includes:
+                file_includes[path] = self._find_latexpand_includes(
+                    root_dir, full_path)
+
+            # Visit the included files
+            pending_paths.extend(file_includes[path])
+
+        # Build the key and return
+        return expansion_cache.build_key({
+            'file': relative_path,
+            'hashes': [[path, file_hashes.get(path)]
+                       for path in sorted(visited_paths)],
+            'extra_args': self.command_options['latexpand']['extra_args'],
+            'version': self._read_latexpand_version(),
+        })
+
+    def _find_latexpand_includes(self, root_dir, full_path):
+        # Read the content
+        with open(full_path, encoding='utf-8', errors='replace') as fp:
+            content = fp.read()
+
+        # Initialize the included files
+        includes = []
+
+        # Initialize the pattern of the commands (Commented commands are
+        # matched as well, which only makes the key more conservative)
+        pattern = re.compile(
+            r'\\(?:input|include|subfile)\s*\{(?P<braced>[^}]+)\}|' +
+            r'\\input\s+(?P<bare>[^\s{}\\%]+)|' +
+            r'\\(?:usepackage|RequirePackage)\s*(?:\[[^\]]*\])?' +
+            r'\s*\{(?P<packages>[^}]+)\}')
+
+        # Check each command
+        for match in pattern.finditer(content):
+            if match.group('packages'):
+                # Add the local packages (expanded by --expand-usepackage)
+                names = ['{}.sty'.format(name.strip())
+                         for name in match.group('packages').split(',')]
+            else:
+                # Add the input file with or without the TEX extension
+                name = (match.group('braced') or match.group('bare')).strip()
+                names = [name, '{}.tex'.format(name)]
+
+            # Add the names which exist or the first name otherwise
+            existing_names = [
+                name for name in names
+                if does_file_exist(combine_paths(root_dir, name))]
+            includes.append((existing_names or names)[0])
+
+        # Return the included files
+        return includes
+
+    def _read_latexpand_version(self):
+        # Read the version only once
+        if self.latexpand_version is None:
+            # Build the command
+            command = 'latexpand --version'
+
+            # Run the command
+            _, stdout, _ = run_command(
+                command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+            # Save the version
+            self.latexpand_version = (stdout or '').strip()
+
+        # Return the version
+        return self.latexpand_version
+
     def _build_latexpand_command(self, output_path, input_path):
         # Get the extra arguments
         extra_args = self.command_options['latexpand']['extra_args']
@@ -126,18 +466,25 @@ class LatexRunner:
             '"{}"'.format(input_path),
         ])
 
-    def _build_latex_compiler_command(self, tex_file):
+    def _build_latex_compiler_command(self, tex_file, build_dir=None):
         # Get the compiler
         compiler = self.command_options['latex']['compiler']
 
         # Get the extra arguments
         extra_args = self.command_options['latex']['extra_args']
 
+        # Build the output directory argument
+        if build_dir:
+            output_dir_arg = '-output-directory="{}"'.format(build_dir)
+        else:
+            output_dir_arg = ''
+
         # Build the command and return
         return ' '.join([
             compiler,
             '-interaction=nonstopmode',
             '-recorder',
+            output_dir_arg,
             extra_args,
             '"{}"'.format(tex_file),
         ])
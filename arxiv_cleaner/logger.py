@@ -1,10 +1,26 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
+import threading
+
+
+# Lock guarding the handler setup of all loggers
+_setup_lock = threading.Lock()
+
+# Mapping from the logger name to its stream handler, queue handler and queue
+# listener
+_setups = {}
 
 
 class Logger:
-    def __init__(self, name, level='WARNING'):
+    def __init__(self, name, level='WARNING', json_lines=False, fields=None):
         # Save the arguments
         self.name = name
+        self.level = level
+        self.json_lines = json_lines
+        self.fields = fields or {}
 
         # Initialize the level
         self._init_level(level)
@@ -12,52 +28,54 @@ class Logger:
         # Initialize the logger
         self._init_logger()
 
-    def debug(self, messages):
+    def debug(self, messages, **fields):
         # Flatten the messages
         flattened_message = self._flatten_messages(messages)
 
         # Log the debugging message
-        self.logger.debug(flattened_message)
+        self.logger.debug(flattened_message, extra=self._build_extra(fields))
 
         # Return the flattened message
         return flattened_message
 
-    def info(self, messages):
+    def info(self, messages, **fields):
         # Flatten the messages
         flattened_message = self._flatten_messages(messages)
 
         # Log the info
-        self.logger.info(flattened_message)
+        self.logger.info(flattened_message, extra=self._build_extra(fields))
 
         # Return the flattened message
         return flattened_message
 
-    def warning(self, messages):
+    def warning(self, messages, **fields):
         # Flatten the messages
         flattened_message = self._flatten_messages(messages)
 
         # Log the warning
-        self.logger.warning(flattened_message)
+        self.logger.warning(
+            flattened_message, extra=self._build_extra(fields))
 
         # Return the flattened message
         return flattened_message
 
-    def error(self, messages):
+    def error(self, messages, **fields):
         # Flatten the messages
         flattened_message = self._flatten_messages(messages)
 
         # Log the error
-        self.logger.error(flattened_message)
+        self.logger.error(flattened_message, extra=self._build_extra(fields))
 
         # Return the flattened message
         return flattened_message
 
-    def exception(self, messages):
+    def exception(self, messages, **fields):
         # Flatten the messages
         flattened_message = self._flatten_messages(messages)
 
         # Log the exception
-        self.logger.exception(flattened_message)
+        self.logger.exception(
+            flattened_message, extra=self._build_extra(fields))
 
         # Return the flattened message
         return flattened_message
@@ -68,7 +86,7 @@ class Logger:
             'DEBUG': logging.DEBUG,
             'INFO': logging.INFO,
             'WARNING': logging.WARNING,
-            'ERROR': logging.error,
+            'ERROR': logging.ERROR,
             'CRITICAL': logging.CRITICAL,
         }
 
@@ -79,21 +97,59 @@ class Logger:
         # Get the logger and save
         self.logger = logging.getLogger(self.name)
 
-        # Set the logging level
-        self.logger.setLevel(self.logging_level)
-
-        # Create a stream handler
-        ch = logging.StreamHandler()
-
-        # Create the formatter
-        formatter = logging.Formatter(
-            '%(asctime)-15s %(name)-8s %(levelname)-8s %(message)s')
-
-        # Set the formatter of the stream handler
-        ch.setFormatter(formatter)
-
-        # Add the handlers to the logger
-        self.logger.addHandler(ch)
+        # Set up the handlers only once for each logger name (The level and
+        # format are carried by each record, so loggers with different
+        # settings can share the handlers)
+        with _setup_lock:
+            # Skip when the handlers have been set up
+            if self.name in _setups:
+                return
+
+            # Pass all records to the handlers unless the embedding code has
+            # set a level (The level of each logger is checked by the level
+            # filter, and a level set on the logging logger still applies)
+            if self.logger.level == logging.NOTSET:
+                self.logger.setLevel(logging.DEBUG)
+
+            # Create a stream handler formatting each record in the format of
+            # its logger
+            ch = logging.StreamHandler()
+            ch.setFormatter(RecordFormatter())
+
+            # Create a queue handler so that logging never blocks on the
+            # stream
+            log_queue = queue.Queue()
+            qh = logging.handlers.QueueHandler(log_queue)
+
+            # Drop the records below the level of their logger
+            qh.addFilter(LevelFilter())
+
+            # Create a listener writing the queued records to the stream
+            listener = logging.handlers.QueueListener(log_queue, ch)
+
+            # Start the listener
+            listener.start()
+
+            # Add the queue handler to the logger
+            self.logger.addHandler(qh)
+
+            # Avoid printing the records again by the ancestor loggers
+            self.logger.propagate = False
+
+            # Save the setup
+            _setups[self.name] = (ch, qh, listener)
+
+    def _build_extra(self, fields):
+        # Merge the bound fields and the fields of the message
+        merged_fields = dict(self.fields)
+        merged_fields.update(fields)
+
+        # Build the extra attributes of the record and return
+        return {
+            'fields': merged_fields,
+            'min_level': self.logging_level,
+            'json_lines': self.json_lines,
+        }
 
     def _flatten_messages(self, messages):
         # Check the messages type
@@ -106,3 +162,59 @@ class Logger:
         else:
             raise ValueError(
                 'Unknown messages type "{}"'.format(type(messages)))
+
+
+class LevelFilter(logging.Filter):
+    def filter(self, record):
+        # Keep the record at or above the level of its logger
+        return record.levelno >= getattr(record, 'min_level', logging.NOTSET)
+
+
+class RecordFormatter(logging.Formatter):
+    def __init__(self):
+        # Initialize the formatter
+        super().__init__()
+
+        # Create the formatters of both formats
+        self.text_formatter = logging.Formatter(
+            '%(asctime)-15s %(name)-8s %(levelname)-8s %(message)s')
+        self.json_lines_formatter = JsonLinesFormatter()
+
+    def format(self, record):
+        # Format the record in the format of its logger and return
+        if getattr(record, 'json_lines', False):
+            return self.json_lines_formatter.format(record)
+        else:
+            return self.text_formatter.format(record)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        # Build the entry
+        entry = {
+            'time': self.formatTime(record),
+            'name': record.name,
+            'level': record.levelname,
+            'message': record.getMessage(),
+        }
+
+        # Add the fields of the record
+        entry.update(getattr(record, 'fields', {}))
+
+        # Serialize the entry in one line and return
+        return json.dumps(entry, sort_keys=True)
+
+
+@atexit.register
+def shutdown_loggers():
+    # Stop each listener after writing the queued records
+    with _setup_lock:
+        for name, (_, qh, listener) in _setups.items():
+            # Detach the queue handler from the logger
+            logging.getLogger(name).removeHandler(qh)
+
+            # Stop the listener
+            listener.stop()
+
+        # Remove the stopped setups
+        _setups.clear()
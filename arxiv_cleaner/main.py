@@ -1,3 +1,5 @@
+import json
+
 from arxiv_cleaner.arguments import parse_args
 from arxiv_cleaner.cleaner import Cleaner
 
@@ -6,6 +8,17 @@ def main():
     # Parse the arguments
     args = parse_args()
 
+    # Create the cleaner
+    cleaner = Cleaner(**build_cleaner_options(args))
+
+    # Run the cleaner
+    cleaner.clean()
+
+    # Print the finish message
+    print('Done')
+
+
+def build_cleaner_options(args):
     # Create the command options
     command_options = {
         'latex': {
@@ -21,16 +34,29 @@ def main():
         },
     }
 
-    # Create the cleaner
-    cleaner = Cleaner(input_dir=args.input, output_dir=args.output,
-                      tex=args.tex, command_options=command_options,
-                      verbose=args.verbose)
-
-    # Run the cleaner
-    cleaner.clean()
-
-    # Print the finish message
-    print('Done')
+    # Read the targets
+    if args.targets:
+        with open(args.targets, 'r', encoding='utf-8') as fp:
+            targets = json.load(fp)
+    else:
+        targets = None
+
+    # Build the options of the cleaner and return
+    return {
+        'input_dir': args.input,
+        'output_dir': args.output,
+        'tex': args.tex,
+        'command_options': command_options,
+        'verbose': args.verbose,
+        'jobs': args.jobs,
+        'cache_dir': args.cache_dir or None,
+        'cache_max_size': int(args.cache_max_size * 1024 * 1024),
+        'graph_path': args.graph or None,
+        'log_json': args.log_json,
+        'sequential': args.sequential,
+        'targets': targets,
+        'overlay': args.overlay,
+    }
 
 
 if __name__ == '__main__':
@@ -0,0 +1,56 @@
+from arxiv_cleaner.arguments import parse_query_args
+from arxiv_cleaner.graph import DependencyGraph
+
+
+def main():
+    # Parse the arguments
+    args = parse_query_args()
+
+    # Load the dependency graph
+    graph = DependencyGraph.load(args.graph)
+
+    # Run the query
+    if args.needs:
+        # Find the files needed by the TEX files
+        paths = graph.find_files(args.needs.split(','))
+
+        # Print the files and the total size
+        print_files(graph, paths)
+    elif args.users:
+        # Find the TEX files which need the file
+        roots = graph.find_roots(args.users)
+
+        # Print the TEX files
+        for root in roots:
+            print(root)
+    else:
+        # Find the remaining TEX files
+        roots = graph.find_roots_except(args.without.split(','))
+
+        # Find the files needed by the remaining TEX files
+        paths = graph.find_files(roots)
+
+        # Find the files which would be dropped
+        dropped_paths = sorted(
+            set(graph.find_files(list(graph.roots))) - set(paths))
+
+        # Print the dropped files
+        for path in dropped_paths:
+            print('- {}'.format(path))
+
+        # Print the remaining files and the total size
+        print_files(graph, paths)
+
+
+def print_files(graph, paths):
+    # Print each file with its size
+    for path in paths:
+        print('{:>12} {}'.format(graph.compute_size([path]), path))
+
+    # Print the total size
+    print('Total: {} bytes in {} files'.format(
+        graph.compute_size(paths), len(paths)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import os
+
+
+class Task:
+    def __init__(self, name, func, inputs=None, outputs=None, after=None):
+        # Save the arguments (The values in "after" must be available before
+        # running the task but are not passed to the function)
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs or [])
+        self.outputs = list(outputs or [])
+        self.after = list(after or [])
+
+    def requires(self):
+        # Return all values required before running the task
+        return self.inputs + self.after
+
+    def run(self, values):
+        # Collect the input values
+        args = [values[name] for name in self.inputs]
+
+        # Run the function
+        result = self.func(*args)
+
+        # Map the result to the outputs and return
+        if len(self.outputs) == 0:
+            return {}
+        elif len(self.outputs) == 1:
+            return {self.outputs[0]: result}
+        else:
+            return dict(zip(self.outputs, result))
+
+
+class Scheduler:
+    def __init__(self, jobs=None, sequential=False):
+        # Save the arguments (Use the number of processors by default, as the
+        # default of the thread pool depends on the Python version)
+        self.jobs = jobs or os.cpu_count() or 1
+        self.sequential = sequential
+
+    def run(self, tasks):
+        # Check the task graph
+        self._check_tasks(tasks)
+
+        # Run the tasks and return the values
+        if self.sequential:
+            return self._run_sequentially(tasks)
+        else:
+            return self._run_concurrently(tasks)
+
+    def _run_sequentially(self, tasks):
+        # Initialize the values
+        values = {}
+
+        # Run each task in the given order
+        for task in tasks:
+            # Check whether the inputs are ready
+            if not self._is_ready(task, values):
+                raise ValueError(
+                    'Task "{}" is listed before its inputs'.format(task.name))
+
+            # Run the task and save the outputs
+            values.update(task.run(values))
+
+        # Return the values
+        return values
+
+    def _run_concurrently(self, tasks):
+        # Initialize the values
+        values = {}
+
+        # Initialize the pending tasks
+        pending_tasks = list(tasks)
+
+        # Initialize the mapping from running futures to tasks
+        running = {}
+
+        # Initialize the first error
+        error = None
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            while True:
+                # Submit all ready tasks unless there was an error
+                if error is None:
+                    for task in list(pending_tasks):
+                        if self._is_ready(task, values):
+                            # Remove the task from the pending tasks
+                            pending_tasks.remove(task)
+
+                            # Submit the task
+                            future = executor.submit(task.run, dict(values))
+                            running[future] = task
+
+                # Stop when there is nothing running
+                if len(running) == 0:
+                    break
+
+                # Wait for any running task to finish
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                # Collect the results of the finished tasks
+                for future in done:
+                    # Remove the finished task
+                    running.pop(future)
+
+                    # Save the outputs or the first error
+                    try:
+                        values.update(future.result())
+                    except Exception as e:
+                        error = error or e
+
+        # Raise the first error
+        if error is not None:
+            raise error
+
+        # Return the values
+        return values
+
+    def _check_tasks(self, tasks):
+        # Initialize the producers of the outputs
+        producers = {}
+
+        # Check whether each output is produced by only one task
+        for task in tasks:
+            for output in task.outputs:
+                if output in producers:
+                    raise ValueError(('Output "{}" is produced by tasks' +
+                                      ' "{}" and "{}"').format(
+                        output, producers[output], task.name))
+
+                # Save the producer
+                producers[output] = task.name
+
+        # Check whether each input is produced by a task
+        for task in tasks:
+            for name in task.requires():
+                if name not in producers:
+                    raise ValueError(
+                        'Input "{}" of task "{}" is never produced'.format(
+                            name, task.name))
+
+        # Check whether the tasks contain a cycle
+        self._check_cycles(tasks)
+
+    def _check_cycles(self, tasks):
+        # Initialize the available values
+        values = set()
+
+        # Initialize the remaining tasks
+        remaining_tasks = list(tasks)
+
+        # Resolve the tasks whose inputs are available until none is left
+        while len(remaining_tasks) > 0:
+            # Find the ready tasks
+            ready_tasks = [task for task in remaining_tasks
+                           if all(name in values
+                                  for name in task.requires())]
+
+            # Check whether no task can make progress
+            if len(ready_tasks) == 0:
+                raise ValueError('Tasks {} depend on each other'.format(
+                    ', '.join('"{}"'.format(task.name)
+                              for task in remaining_tasks)))
+
+            # Resolve the ready tasks
+            for task in ready_tasks:
+                remaining_tasks.remove(task)
+                values.update(task.outputs)
+
+    def _is_ready(self, task, values):
+        # Check whether all inputs are available
+        return all(name in values for name in task.requires())
@@ -0,0 +1,504 @@
+import copy
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import threading
+import time
+import traceback
+import uuid
+
+from arxiv_cleaner.arguments import parse_spool_args
+from arxiv_cleaner.cleaner import Cleaner
+from arxiv_cleaner.file_utils import (
+    build_relative_path, combine_paths, find_files, get_file_size)
+from arxiv_cleaner.logger import Logger, shutdown_loggers
+from arxiv_cleaner.main import build_cleaner_options
+
+
+class Spool:
+    # Subdirectories holding the jobs in each state
+    STATES = ['queue', 'claimed', 'leases', 'done', 'failed', 'tmp']
+
+    def __init__(self, spool_dir):
+        # Save the arguments
+        self.spool_dir = spool_dir
+
+        # Initialize the last change of each claimed job seen by this process
+        # (Mapping from the job ID to the file times and the local time when
+        # they were first seen)
+        self.observations = {}
+
+        # Create the subdirectories
+        for state in self.STATES:
+            os.makedirs(self._build_dir(state), exist_ok=True)
+
+    ############################################################################
+    # Coordinator
+    ############################################################################
+
+    def submit(self, options):
+        # Build a job ID sorted by the submission time
+        job_id = '{:017d}-{}'.format(
+            int(time.time() * 1000000), uuid.uuid4().hex[:8])
+
+        # Build the job
+        job = {
+            'id': job_id,
+            'submitted': time.time(),
+            'options': options,
+        }
+
+        # Write the job to the queue atomically
+        self._write_json(self._build_path('queue', job_id), job)
+
+        # Return the job ID
+        return job_id
+
+    def requeue_stale(self, lease_timeout):
+        # Initialize the requeued jobs
+        job_ids = []
+
+        # Initialize the observations of the jobs still claimed
+        observations = {}
+
+        # Read the local time (The file times are set by the clocks of other
+        # hosts or the file server, so only their changes are compared)
+        now = time.monotonic()
+
+        # Check each claimed job
+        for job_id in self._list_jobs('claimed'):
+            # Read the times of the lease and the claimed job
+            signature = (
+                self._read_mtime(self._build_path('leases', job_id)),
+                self._read_mtime(self._build_path('claimed', job_id)))
+
+            # Skip the job which is finished in between
+            if signature == (None, None):
+                continue
+
+            # Start watching the job when it is new or has changed
+            observation = self.observations.get(job_id)
+            if observation is None or observation[0] != signature:
+                observations[job_id] = (signature, now)
+                continue
+
+            # Keep watching the job which is still alive
+            observations[job_id] = observation
+            if now - observation[1] < lease_timeout:
+                continue
+
+            # Remove the stale lease first (The stale worker then finds its
+            # lease lost, and a worker claiming the job again keeps its new
+            # lease)
+            self._remove(self._build_path('leases', job_id))
+
+            # Move the job back to the queue atomically
+            try:
+                os.rename(self._build_path('claimed', job_id),
+                          self._build_path('queue', job_id))
+            except FileNotFoundError:
+                continue
+
+            # Stop watching the requeued job
+            observations.pop(job_id)
+
+            # Add the requeued job
+            job_ids.append(job_id)
+
+        # Save the observations
+        self.observations = observations
+
+        # Return the requeued jobs
+        return job_ids
+
+    def count_jobs(self):
+        # Count the jobs in each state and return
+        return {state: len(self._list_jobs(state))
+                for state in ['queue', 'claimed', 'done', 'failed']}
+
+    ############################################################################
+    # Worker
+    ############################################################################
+
+    def claim(self, worker_id):
+        # Try the queued jobs in the submission order
+        for job_id in self._list_jobs('queue'):
+            # Build the path to the claimed job
+            claimed_path = self._build_path('claimed', job_id)
+
+            # Claim the job by moving it atomically (Only one worker wins)
+            try:
+                os.rename(self._build_path('queue', job_id), claimed_path)
+            except FileNotFoundError:
+                continue
+
+            # Mark the claim time (The rename keeps the submission time, so a
+            # job claimed again would look unchanged to the coordinator)
+            try:
+                os.utime(claimed_path)
+            except FileNotFoundError:
+                continue
+
+            # Build a token identifying this claim (The same job may be
+            # claimed again after being requeued)
+            token = uuid.uuid4().hex
+
+            # Take the lease of the job
+            self._write_json(self._build_path('leases', job_id), {
+                'worker': worker_id,
+                'token': token,
+                'time': time.time(),
+            })
+
+            # Read the job with its token and return
+            return dict(self._read_json(claimed_path), token=token)
+
+        # Return nothing when the queue is empty
+        return None
+
+    def heartbeat(self, job_id, token):
+        # Build the path to the lease
+        lease_path = self._build_path('leases', job_id)
+
+        # Check whether the lease is still held by the claim
+        try:
+            if self._read_json(lease_path)['token'] != token:
+                return False
+        except FileNotFoundError:
+            return False
+
+        # Renew the lease by updating its time only (A lease taken by another
+        # worker in between is merely renewed, never overwritten)
+        try:
+            os.utime(lease_path)
+        except FileNotFoundError:
+            return False
+
+        # Return whether the lease is renewed
+        return True
+
+    def finish(self, job, manifest, succeeded, outputs=None):
+        # Renew the lease once more so that it cannot expire while finishing
+        # (A worker which lost its lease drops the result since the job is
+        # claimed by another worker)
+        if not self.heartbeat(job['id'], job['token']):
+            return False
+
+        # Publish the scratch outputs of the succeeded job or remove them
+        for scratch_path, output_path in outputs or []:
+            if succeeded:
+                publish_output(scratch_path, output_path)
+            else:
+                remove_output(scratch_path)
+
+        # Write the job with its manifest to the final state
+        state = 'done' if succeeded else 'failed'
+        self._write_json(self._build_path(state, job['id']),
+                         dict(job, manifest=manifest))
+
+        # Remove the claimed job and its lease
+        self._remove(self._build_path('claimed', job['id']))
+        self._remove(self._build_path('leases', job['id']))
+
+        # Return whether the job is finished
+        return True
+
+    ############################################################################
+    # Helpers
+    ############################################################################
+
+    def _build_dir(self, state):
+        # Build the path to the subdirectory and return
+        return combine_paths(self.spool_dir, state)
+
+    def _build_path(self, state, job_id):
+        # Build the path to the job file and return
+        return combine_paths(self._build_dir(state), '{}.json'.format(job_id))
+
+    def _list_jobs(self, state):
+        # List the job IDs in the subdirectory in the submission order
+        return sorted(name[:-len('.json')]
+                      for name in os.listdir(self._build_dir(state))
+                      if name.endswith('.json'))
+
+    def _write_json(self, path, data):
+        # Build a unique temporary path on the same file system
+        temp_path = combine_paths(self._build_dir('tmp'), '{}.{}'.format(
+            uuid.uuid4().hex, os.path.basename(path)))
+
+        # Write the data to the temporary path
+        with open(temp_path, 'w', encoding='utf-8') as fp:
+            json.dump(data, fp, indent=2, sort_keys=True)
+
+        # Move the file into place atomically
+        os.replace(temp_path, path)
+
+    def _read_json(self, path):
+        # Read the data and return
+        with open(path, 'r', encoding='utf-8') as fp:
+            return json.load(fp)
+
+    def _read_mtime(self, path):
+        # Read the modification time or nothing if the file is missing
+        try:
+            return os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _remove(self, path):
+        # Remove the file if it exists
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def run_worker(spool_dir, worker_id, poll_interval=2.0,
+               heartbeat_interval=30.0, exit_when_empty=False):
+    # Open the spool
+    spool = Spool(spool_dir)
+
+    # Create a logger carrying the worker in each record
+    logger = Logger('spool', level='INFO', fields={'worker': worker_id})
+
+    # Process the jobs until the queue is empty (if requested)
+    while True:
+        # Claim the next job
+        job = spool.claim(worker_id)
+
+        # Wait for new jobs when the queue is empty
+        if job is None:
+            if exit_when_empty:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        # Log the start
+        logger.info('Start job "{}"'.format(job['id']), job=job['id'])
+
+        # Renew the lease in the background while the job runs
+        stop_event = threading.Event()
+        heartbeat_thread = threading.Thread(
+            target=_renew_lease,
+            args=(spool, job['id'], job['token'], heartbeat_interval,
+                  stop_event),
+            daemon=True)
+        heartbeat_thread.start()
+
+        # Redirect the outputs to scratch paths of this claim (A worker which
+        # loses its lease never writes to the outputs of the new owner)
+        options, outputs = build_scratch_options(job['options'], job['token'])
+
+        # Initialize the manifest
+        manifest = {
+            'worker': worker_id,
+            'started': time.time(),
+        }
+
+        # Run the job
+        try:
+            manifest['outputs'] = run_job(options, outputs)
+            succeeded = True
+        except Exception:
+            manifest['error'] = traceback.format_exc()
+            succeeded = False
+
+        # Stop renewing the lease
+        stop_event.set()
+        heartbeat_thread.join()
+
+        # Save the manifest and publish the outputs
+        manifest['finished'] = time.time()
+        if not spool.finish(job, manifest, succeeded, outputs):
+            # Remove the scratch outputs
+            for scratch_path, _ in outputs:
+                remove_output(scratch_path)
+
+            # Log the dropped result
+            logger.warning(
+                'Drop job "{}" (The lease was lost and the job requeued)'
+                .format(job['id']), job=job['id'])
+            continue
+
+        # Log the finish
+        logger.info('Finish job "{}" ({})'.format(
+            job['id'], 'done' if succeeded else 'failed'), job=job['id'])
+
+    # Write the queued log records (Worker processes skip the exit handlers)
+    shutdown_loggers()
+
+
+def run_job(options, outputs):
+    # Create the cleaner
+    cleaner = Cleaner(**options)
+
+    # Run the cleaner
+    cleaner.clean()
+
+    # Map the scratch paths to the output paths
+    output_paths = dict(outputs)
+
+    # Initialize the output files of each target
+    files = {}
+
+    # List the output files with their sizes
+    for target in cleaner.targets:
+        files[output_paths[target.output_dir]] = {
+            build_relative_path(path, target.output_dir): get_file_size(path)
+            for path in find_files(target.output_dir)}
+
+    # Return the output files
+    return files
+
+
+def build_scratch_options(options, token):
+    # Copy the options
+    options = copy.deepcopy(options)
+
+    # Initialize the pairs of scratch and output paths
+    outputs = []
+
+    def redirect(container, key):
+        # Skip the path which is not given
+        if not container.get(key):
+            return
+
+        # Build the scratch path next to the output path (On the same file
+        # system, so it can be published by renaming)
+        scratch_path = '{}.claim-{}'.format(container[key], token)
+
+        # Remove the scratch path left by a crashed run of this claim
+        remove_output(scratch_path)
+
+        # Redirect the path and save the pair
+        outputs.append((scratch_path, container[key]))
+        container[key] = scratch_path
+
+    # Redirect the output directory and graph of the single target
+    redirect(options, 'output_dir')
+    redirect(options, 'graph_path')
+
+    # Redirect the output directory and graph of each target
+    for spec in options.get('targets') or []:
+        redirect(spec, 'output')
+        redirect(spec, 'graph')
+
+    # Return the options and the pairs of scratch and output paths
+    return options, outputs
+
+
+def publish_output(scratch_path, output_path):
+    # Skip the output which was not written
+    if not os.path.exists(scratch_path):
+        return
+
+    # Replace the output file atomically
+    if not os.path.isdir(scratch_path):
+        os.replace(scratch_path, output_path)
+        return
+
+    # Move the previous output directory aside
+    old_path = '{}.old-{}'.format(output_path, uuid.uuid4().hex)
+    if os.path.exists(output_path):
+        os.rename(output_path, old_path)
+
+    # Move the scratch directory into place
+    os.rename(scratch_path, output_path)
+
+    # Remove the previous output directory
+    remove_output(old_path)
+
+
+def remove_output(path):
+    # Remove the directory or file if it exists
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _renew_lease(spool, job_id, token, heartbeat_interval, stop_event):
+    # Renew the lease until the job finishes or the lease is lost
+    while not stop_event.wait(heartbeat_interval):
+        if not spool.heartbeat(job_id, token):
+            break
+
+
+def _make_paths_absolute(options):
+    # Make the paths absolute so that workers on other hosts find them
+    for key in ['input_dir', 'output_dir', 'graph_path', 'cache_dir']:
+        if options.get(key):
+            options[key] = os.path.abspath(options[key])
+
+    # Make the paths of each target absolute
+    for spec in options.get('targets') or []:
+        for key in ['output', 'graph']:
+            if spec.get(key):
+                spec[key] = os.path.abspath(spec[key])
+
+    # Return the options
+    return options
+
+
+def main():
+    # Parse the arguments
+    args = parse_spool_args()
+
+    # Open the spool
+    spool = Spool(args.spool)
+
+    # Run the subcommand
+    if args.command == 'submit':
+        # Build the options of the cleaner
+        options = _make_paths_absolute(build_cleaner_options(args))
+
+        # Submit the job and print its ID
+        print(spool.submit(options))
+    elif args.command == 'worker':
+        # Build the prefix of the worker IDs
+        prefix = '{}-{}'.format(socket.gethostname(), os.getpid())
+
+        # Start the local worker processes
+        processes = [
+            multiprocessing.Process(
+                target=run_worker,
+                args=(args.spool, '{}-{}'.format(prefix, i),
+                      args.poll_interval, args.heartbeat_interval,
+                      args.exit_when_empty))
+            for i in range(args.processes)]
+        for process in processes:
+            process.start()
+
+        # Wait for the worker processes
+        for process in processes:
+            process.join()
+    elif args.command == 'wait':
+        # Wait until no job is queued or claimed
+        while True:
+            # Requeue the jobs of crashed workers
+            for job_id in spool.requeue_stale(args.lease_timeout):
+                print('Requeued stale job "{}"'.format(job_id))
+
+            # Stop when all jobs are finished
+            counts = spool.count_jobs()
+            if counts['queue'] == 0 and counts['claimed'] == 0:
+                break
+
+            # Wait before checking again
+            time.sleep(args.poll_interval)
+
+        # Print the status
+        print(json.dumps(counts, sort_keys=True))
+
+        # Exit with an error if any job failed
+        if counts['failed'] > 0:
+            raise SystemExit(1)
+    else:
+        # Print the status
+        print(json.dumps(spool.count_jobs(), sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import copy
+
+from arxiv_cleaner.latex import LatexRunner
+
+
+# Mapping from the option keys of a target to the command options
+OPTION_KEYS = {
+    'latex_compiler': ('latex', 'compiler'),
+    'latex_extra_args': ('latex', 'extra_args'),
+    'bib_compiler': ('bib', 'compiler'),
+    'bib_extra_args': ('bib', 'extra_args'),
+}
+
+
+class Target:
+    def __init__(self, name, output_dir, tex_files, command_options,
+                 graph_path=None):
+        # Save the arguments
+        self.name = name
+        self.output_dir = output_dir
+        self.tex_files = tex_files
+        self.command_options = command_options
+        self.graph_path = graph_path
+
+        # Parse the latex compilers (Several compilers are separated by
+        # commas)
+        self.latex_compilers = [
+            compiler.strip()
+            for compiler in command_options['latex']['compiler'].split(',')]
+
+        # Create a latex runner for each latex compiler
+        self.latex_runners = []
+        for compiler in self.latex_compilers:
+            # Copy the command options with the latex compiler
+            compiler_command_options = copy.deepcopy(command_options)
+            compiler_command_options['latex']['compiler'] = compiler
+
+            # Create the latex runner
+            self.latex_runners.append(LatexRunner(compiler_command_options))
+
+        # Use the first latex runner for the bibliography
+        self.latex_runner = self.latex_runners[0]
+
+
+def create_target(spec, command_options):
+    # Check the keys of the specification
+    for key in spec:
+        if key not in ['name', 'output', 'tex', 'graph'] and \
+                key not in OPTION_KEYS:
+            raise ValueError('Unknown target option "{}"'.format(key))
+
+    # Check the required keys
+    for key in ['output', 'tex']:
+        if not spec.get(key):
+            raise ValueError('Target option "{}" is required'.format(key))
+
+    # Copy the shared command options
+    target_command_options = copy.deepcopy(command_options)
+
+    # Override the command options of the target
+    for key, (group, option) in OPTION_KEYS.items():
+        if key in spec:
+            target_command_options[group][option] = spec[key]
+
+    # Create the target and return (The output directory names the target by
+    # default)
+    return Target(name=spec.get('name', spec['output']),
+                  output_dir=spec['output'],
+                  tex_files=spec['tex'].split(','),
+                  command_options=target_command_options,
+                  graph_path=spec.get('graph'))
@@ -0,0 +1,89 @@
+import os
+
+from arxiv_cleaner.cache import FileCache
+
+
+def write_file(path, content):
+    # Write the content to the file
+    with open(str(path), 'w') as fp:
+        fp.write(content)
+
+
+def read_file(path):
+    # Read the content of the file and return
+    with open(str(path)) as fp:
+        return fp.read()
+
+
+def test_get_and_put_count_hits_and_misses(tmp_path):
+    # Create the cache and the file to cache
+    cache = FileCache(cache_dir=str(tmp_path / 'cache'), name='bbl')
+    src_path = tmp_path / 'main.bbl'
+    write_file(src_path, 'bibliography')
+    key = cache.build_key({'citations': ['k1']})
+
+    # Check the miss before putting the file
+    assert not cache.get(key, str(tmp_path / 'out' / 'miss.bbl'))
+
+    # Check the hit after putting the file
+    cache.put(key, str(src_path))
+    assert cache.get(key, str(tmp_path / 'out' / 'hit.bbl'))
+    assert read_file(tmp_path / 'out' / 'hit.bbl') == 'bibliography'
+
+    # Check the counters
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_build_key_is_stable_and_order_sensitive():
+    # Create the cache
+    cache = FileCache(name='bbl')
+
+    # Check whether the dictionary order doesn't matter but list order does
+    assert cache.build_key({'a': 1, 'b': [1, 2]}) == \
+        cache.build_key({'b': [1, 2], 'a': 1})
+    assert cache.build_key({'b': [1, 2]}) != cache.build_key({'b': [2, 1]})
+
+
+def test_disabled_cache_does_nothing(tmp_path):
+    # Create the cache without a directory
+    cache = FileCache(name='bbl', max_size=0)
+    src_path = tmp_path / 'main.bbl'
+    write_file(src_path, 'bibliography')
+
+    # Check whether nothing is cached or counted
+    cache.put('key', str(src_path))
+    assert not cache.get('key', str(tmp_path / 'out.bbl'))
+    cache.trim()
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_trim_removes_least_recently_used_files_of_own_cache(tmp_path):
+    # Create the cache bounded to two files of 10 bytes
+    cache_dir = tmp_path / 'cache'
+    cache = FileCache(cache_dir=str(cache_dir), name='bbl', max_size=20)
+    src_path = tmp_path / 'main.bbl'
+    write_file(src_path, '0123456789')
+
+    # Put three files used one after another
+    keys = [cache.build_key([i]) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, str(src_path))
+        cached_path = cache._build_cached_path(key)
+        os.utime(cached_path, (1000 + i, 1000 + i))
+
+    # Use the oldest file so that the second one is the least recently used
+    assert cache.get(keys[0], str(tmp_path / 'out.bbl'))
+
+    # Add a file of another program and a file being written
+    write_file(cache_dir / 'other.db', 'x' * 100)
+    write_file(cache._build_cached_path(keys[1]) + '.1.2.tmp', 'x' * 100)
+
+    # Trim the cache
+    cache.trim()
+
+    # Check whether only the least recently used file is removed
+    assert os.path.exists(cache._build_cached_path(keys[0]))
+    assert not os.path.exists(cache._build_cached_path(keys[1]))
+    assert os.path.exists(cache._build_cached_path(keys[2]))
+    assert os.path.exists(str(cache_dir / 'other.db'))
+    assert os.path.exists(cache._build_cached_path(keys[1]) + '.1.2.tmp')
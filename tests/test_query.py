@@ -0,0 +1,80 @@
+import sys
+
+import pytest
+
+from arxiv_cleaner import query
+from arxiv_cleaner.graph import DependencyGraph
+
+
+@pytest.fixture
+def graph_path(tmp_path):
+    # Build a graph where main.tex and sup.tex share a style file
+    graph = DependencyGraph()
+    graph.add_root('main.tex', ['main.tex', 'style.sty', 'figs/a.pdf'])
+    graph.add_root('sup.tex', ['sup.tex', 'style.sty'])
+    for path, size in [('main.tex', 10), ('sup.tex', 20), ('style.sty', 30),
+                       ('figs/a.pdf', 40)]:
+        graph.add_file(path, 'text', size, None)
+
+    # Save the graph and return its path
+    path = str(tmp_path / 'graph.json')
+    graph.save(path)
+    return path
+
+
+def run_query(monkeypatch, capsys, *args):
+    # Run the query with the arguments
+    monkeypatch.setattr(sys, 'argv', ['query'] + list(args))
+    query.main()
+
+    # Return the printed lines
+    return capsys.readouterr().out.splitlines()
+
+
+def test_save_and_load_keep_the_graph(graph_path):
+    # Load the saved graph
+    graph = DependencyGraph.load(graph_path)
+
+    # Check the queries on the loaded graph
+    assert graph.find_files(['sup.tex']) == ['style.sty', 'sup.tex']
+    assert graph.find_roots('style.sty') == ['main.tex', 'sup.tex']
+    assert graph.compute_size(['main.tex', 'figs/a.pdf']) == 50
+
+
+def test_needs_lists_files_and_total_size(monkeypatch, capsys, graph_path):
+    # Query the files needed by sup.tex
+    lines = run_query(monkeypatch, capsys, '--graph', graph_path,
+                      '--needs', 'sup.tex')
+
+    # Check the files and the total size
+    assert [line.split()[-1] for line in lines[:-1]] == \
+        ['style.sty', 'sup.tex']
+    assert lines[-1] == 'Total: 50 bytes in 2 files'
+
+
+def test_users_lists_roots(monkeypatch, capsys, graph_path):
+    # Query the TEX files using the figure
+    lines = run_query(monkeypatch, capsys, '--graph', graph_path,
+                      '--users', 'figs/a.pdf')
+
+    # Check the TEX files
+    assert lines == ['main.tex']
+
+
+def test_without_lists_dropped_and_remaining_files(monkeypatch, capsys,
+                                                   graph_path):
+    # Query the output without main.tex
+    lines = run_query(monkeypatch, capsys, '--graph', graph_path,
+                      '--without', 'main.tex')
+
+    # Check the dropped files, the remaining files and the total size
+    assert lines[:2] == ['- figs/a.pdf', '- main.tex']
+    assert [line.split()[-1] for line in lines[2:-1]] == \
+        ['style.sty', 'sup.tex']
+    assert lines[-1] == 'Total: 50 bytes in 2 files'
+
+
+def test_unknown_root_is_rejected(graph_path):
+    # Check whether an unknown TEX file is rejected
+    with pytest.raises(ValueError):
+        DependencyGraph.load(graph_path).find_files(['missing.tex'])
@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+
+import pytest
+
+from arxiv_cleaner.scheduler import Scheduler, Task
+
+
+def test_run_passes_values_between_tasks():
+    # Build a chain with single and multiple outputs
+    tasks = [
+        Task('pair', lambda: (1, 2), outputs=['a', 'b']),
+        Task('add', lambda a, b: a + b, inputs=['a', 'b'], outputs=['c']),
+    ]
+
+    # Check both modes
+    for sequential in [False, True]:
+        values = Scheduler(jobs=2, sequential=sequential).run(tasks)
+        assert values == {'a': 1, 'b': 2, 'c': 3}
+
+
+def test_run_rejects_cycles():
+    # Build two tasks waiting for each other
+    tasks = [
+        Task('x', lambda: None, outputs=['x'], after=['y']),
+        Task('y', lambda: None, outputs=['y'], after=['x']),
+    ]
+
+    # Check whether the cycle is detected before running
+    with pytest.raises(ValueError, match='depend on each other'):
+        Scheduler().run(tasks)
+
+
+def test_run_rejects_invalid_outputs_and_inputs():
+    # Check the output produced twice
+    with pytest.raises(ValueError, match='produced by tasks'):
+        Scheduler().run([Task('x', lambda: 1, outputs=['v']),
+                         Task('y', lambda: 2, outputs=['v'])])
+
+    # Check the input never produced
+    with pytest.raises(ValueError, match='never produced'):
+        Scheduler().run([Task('x', lambda v: v, inputs=['v'])])
+
+
+def test_run_raises_first_error_and_skips_dependents():
+    # Initialize the tasks which ran
+    ran = []
+
+    def fail():
+        raise RuntimeError('broken')
+
+    # Build a failing task with a dependent task
+    tasks = [
+        Task('fail', fail, outputs=['v']),
+        Task('after', lambda v: ran.append(v), inputs=['v']),
+    ]
+
+    # Check whether the error is raised in both modes
+    for sequential in [False, True]:
+        with pytest.raises(RuntimeError, match='broken'):
+            Scheduler(sequential=sequential).run(tasks)
+
+    # Check whether the dependent task never ran
+    assert ran == []
+
+
+def test_run_limits_parallel_jobs():
+    # Initialize the counters of running tasks
+    lock = threading.Lock()
+    counts = {'running': 0, 'max': 0}
+
+    def work():
+        # Count the running task
+        with lock:
+            counts['running'] += 1
+            counts['max'] = max(counts['max'], counts['running'])
+
+        # Keep the task running for a while
+        time.sleep(0.05)
+
+        # Uncount the running task
+        with lock:
+            counts['running'] -= 1
+
+    # Run independent tasks with two jobs
+    Scheduler(jobs=2).run([Task(str(i), work) for i in range(6)])
+
+    # Check whether at most two tasks ran at the same time
+    assert counts['max'] == 2
+
+
+def test_jobs_default_to_number_of_processors():
+    # Check the default number of jobs
+    assert Scheduler().jobs == (os.cpu_count() or 1)
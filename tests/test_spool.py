@@ -0,0 +1,179 @@
+import multiprocessing
+import os
+import time
+
+from arxiv_cleaner import spool as spool_module
+from arxiv_cleaner.spool import Spool, run_worker
+
+
+def claim_all(spool_dir, worker_id, claimed_queue):
+    # Claim jobs until the queue is empty and report each claimed job
+    spool = Spool(spool_dir)
+    while True:
+        job = spool.claim(worker_id)
+        if job is None:
+            break
+        claimed_queue.put(job['id'])
+
+
+def expire(spool, lease_timeout=0.05):
+    # Watch the claimed jobs and requeue them once they stay unchanged
+    spool.requeue_stale(lease_timeout)
+    time.sleep(lease_timeout * 2)
+    return spool.requeue_stale(lease_timeout)
+
+
+def test_each_job_is_claimed_once_by_several_processes(tmp_path):
+    # Submit the jobs
+    spool_dir = str(tmp_path / 'spool')
+    spool = Spool(spool_dir)
+    job_ids = [spool.submit({'index': i}) for i in range(40)]
+
+    # Claim the jobs by several processes at the same time
+    context = multiprocessing.get_context('fork')
+    claimed_queue = context.Queue()
+    processes = [
+        context.Process(target=claim_all,
+                        args=(spool_dir, 'w{}'.format(i), claimed_queue))
+        for i in range(4)]
+    for process in processes:
+        process.start()
+    claimed_ids = [claimed_queue.get(timeout=30) for _ in job_ids]
+    for process in processes:
+        process.join()
+
+    # Check whether each job is claimed exactly once
+    assert sorted(claimed_ids) == sorted(job_ids)
+    assert spool.count_jobs()['claimed'] == len(job_ids)
+
+
+def test_fresh_claim_of_old_job_is_not_requeued(tmp_path):
+    # Submit a job which waited in the queue for an hour
+    spool = Spool(str(tmp_path / 'spool'))
+    job_id = spool.submit({})
+    old_time = time.time() - 3600
+    os.utime(spool._build_path('queue', job_id), (old_time, old_time))
+
+    # Claim the job
+    spool.claim('w1')
+
+    # Check whether the job is only watched at first
+    assert spool.requeue_stale(300) == []
+    assert spool.count_jobs()['claimed'] == 1
+
+
+def test_requeue_uses_changes_of_lease_not_clock(tmp_path):
+    # Claim a job whose lease time is far in the future (A skewed clock)
+    spool = Spool(str(tmp_path / 'spool'))
+    job_id = spool.submit({})
+    job = spool.claim('w1')
+    future_time = time.time() + 3600
+    os.utime(spool._build_path('leases', job_id), (future_time, future_time))
+
+    # Check whether a renewed lease keeps the job claimed
+    spool.requeue_stale(0.05)
+    time.sleep(0.1)
+    assert spool.heartbeat(job_id, job['token'])
+    assert spool.requeue_stale(0.05) == []
+
+    # Check whether an unchanged lease requeues the job
+    assert expire(spool) == [job_id]
+    assert spool.count_jobs()['queue'] == 1
+
+
+def test_worker_which_lost_lease_cannot_finish(tmp_path):
+    # Claim a job and requeue it as stale
+    spool = Spool(str(tmp_path / 'spool'))
+    job_id = spool.submit({})
+    stale_job = spool.claim('w1')
+    assert expire(spool) == [job_id]
+
+    # Claim the job again by another worker
+    job = spool.claim('w2')
+
+    # Check whether the stale worker neither renews nor finishes the job
+    assert not spool.heartbeat(job_id, stale_job['token'])
+    assert not spool.finish(stale_job, {}, True)
+    assert spool.count_jobs() == {
+        'queue': 0, 'claimed': 1, 'done': 0, 'failed': 0}
+
+    # Check whether the new owner finishes the job
+    assert spool.heartbeat(job_id, job['token'])
+    assert spool.finish(job, {}, True)
+    assert spool.count_jobs() == {
+        'queue': 0, 'claimed': 0, 'done': 1, 'failed': 0}
+
+
+def test_worker_drops_outputs_after_losing_lease(tmp_path, monkeypatch):
+    # Submit a job with an existing output directory
+    spool_dir = str(tmp_path / 'spool')
+    spool = Spool(spool_dir)
+    output_dir = str(tmp_path / 'output')
+    os.makedirs(output_dir)
+    with open(os.path.join(output_dir, 'old.tex'), 'w') as fp:
+        fp.write('old')
+    job_id = spool.submit({'output_dir': output_dir})
+
+    # Initialize the runs
+    runs = []
+
+    def fake_run_job(options, outputs):
+        # Write the output of this run to the scratch directory
+        runs.append(options['output_dir'])
+        os.makedirs(options['output_dir'])
+        with open(os.path.join(options['output_dir'], 'main.tex'), 'w') as fp:
+            fp.write('run {}'.format(len(runs)))
+
+        # Lose the lease during the first run (Requeued by the coordinator)
+        if len(runs) == 1:
+            os.remove(spool._build_path('leases', job_id))
+            os.rename(spool._build_path('claimed', job_id),
+                      spool._build_path('queue', job_id))
+
+        # Return no output files
+        return {}
+
+    # Run a worker until the queue is empty
+    monkeypatch.setattr(spool_module, 'run_job', fake_run_job)
+    run_worker(spool_dir, 'w1', poll_interval=0.01, exit_when_empty=True)
+
+    # Check whether only the second run is published
+    assert len(runs) == 2 and runs[0] != runs[1]
+    assert os.listdir(output_dir) == ['main.tex']
+    with open(os.path.join(output_dir, 'main.tex')) as fp:
+        assert fp.read() == 'run 2'
+    assert sorted(os.listdir(str(tmp_path))) == ['output', 'spool']
+    assert spool.count_jobs() == {
+        'queue': 0, 'claimed': 0, 'done': 1, 'failed': 0}
+
+
+def test_worker_processes_drain_queue(tmp_path, monkeypatch):
+    # Submit the jobs
+    spool_dir = str(tmp_path / 'spool')
+    spool = Spool(spool_dir)
+    for i in range(6):
+        spool.submit({'output_dir': str(tmp_path / 'out{}'.format(i))})
+
+    def fake_run_job(options, outputs):
+        # Write the output to the scratch directory
+        os.makedirs(options['output_dir'])
+        return {}
+
+    # Run several worker processes until the queue is empty
+    monkeypatch.setattr(spool_module, 'run_job', fake_run_job)
+    context = multiprocessing.get_context('fork')
+    processes = [
+        context.Process(target=run_worker, args=(spool_dir, 'w{}'.format(i)),
+                        kwargs={'poll_interval': 0.01,
+                                'exit_when_empty': True})
+        for i in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=30)
+
+    # Check whether all jobs are done and published
+    assert spool.count_jobs() == {
+        'queue': 0, 'claimed': 0, 'done': 6, 'failed': 0}
+    assert sorted(os.listdir(str(tmp_path))) == \
+        ['out{}'.format(i) for i in range(6)] + ['spool']